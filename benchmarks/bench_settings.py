@@ -0,0 +1,27 @@
+from testproject.testproject.settings import *  # noqa
+
+
+DEBUG = False
+
+# RequestFactory's host; Wagtail falls back to the default site for it
+ALLOWED_HOSTS = ['testserver']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Keep the pre-warming threads out of the measurements
+WAGTAIL_EXTENSIONS_RENDITION_PREWARM_WORKERS = 0
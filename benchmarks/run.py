@@ -0,0 +1,391 @@
+"""
+Benchmarks for the extension blocks, tags and contact pipeline.
+
+Runs each scenario against testproject with an in-memory SQLite database and
+locmem cache (see bench_settings.py), and reports wall time, query count and
+peak memory:
+
+    python benchmarks/run.py --size medium --output results.json
+    python benchmarks/run.py --size medium --compare results.json
+
+Compare exits with status 1 if any scenario's median time regressed by more
+than --threshold.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bench_settings')
+
+
+# Data sizes for each scenario. Menus are items x children per item.
+SIZES = {
+    'small': {
+        'menu': (5, 2),
+        'meta_paragraphs': 10,
+        'opening_times': 7,
+        'links': 10,
+        'locations': 5,
+        'true_or_nth': 1000,
+    },
+    'medium': {
+        'menu': (10, 10),
+        'meta_paragraphs': 200,
+        'opening_times': 14,
+        'links': 100,
+        'locations': 100,
+        'true_or_nth': 100000,
+    },
+    'huge': {
+        'menu': (30, 30),
+        'meta_paragraphs': 5000,
+        'opening_times': 60,
+        'links': 1000,
+        'locations': 2000,
+        'true_or_nth': 1000000,
+    },
+}
+
+SCENARIOS = {}
+
+
+def scenario(func):
+    """
+    Registers a scenario. It is called once with the size's parameters to set
+    up its data, and returns the function to measure.
+    """
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+def measure(func, rounds):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    # Warm up imports, template loading and the like
+    func()
+
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    with CaptureQueriesContext(connection) as queries:
+        func()
+
+    tracemalloc.start()
+    try:
+        func()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'rounds': rounds,
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+        'queries': len(queries),
+        'peak_memory': peak_memory,
+    }
+
+
+def get_root_page():
+    from wagtail.core.models import Page
+    return Page.objects.get(url_path='/home/')
+
+
+def get_request(path='/'):
+    from django.test import RequestFactory
+    return RequestFactory().get(path)
+
+
+@scenario
+def menu(size):
+    from django.template import engines
+    from wagtail.core.models import Page
+
+    items, children = size['menu']
+    root = get_root_page().add_child(instance=Page(title='Menu', slug='menu-{}'.format(uuid.uuid4().hex)))
+    for i in range(items):
+        item = root.add_child(instance=Page(title='Item {}'.format(i), slug='item-{}'.format(i), show_in_menus=True))
+        for j in range(children):
+            item.add_child(instance=Page(title='Child {}'.format(j), slug='child-{}'.format(j), show_in_menus=True))
+    root.refresh_from_db()
+    calling_page = root.get_first_child().get_first_child().specific
+
+    template = engines['django'].from_string('{% load wagtailextensions_tags %}{% menu root calling_page %}')
+    request = get_request(calling_page.url)
+
+    return lambda: template.render({'root': root, 'calling_page': calling_page, 'request': request})
+
+
+@scenario
+def metablock(size):
+    from django.template import engines
+
+    paragraph = '<p>Lorem ipsum &amp; <b>dolor</b> sit amet , consectetur .\n   adipiscing elit.</p>\n'
+    template = engines['django'].from_string(
+        '{% load wagtailextensions_tags %}{% metablock %}{{ text|safe }}{% endmetablock %}')
+    context = {'text': paragraph * size['meta_paragraphs']}
+
+    return lambda: template.render(context)
+
+
+@scenario
+def opening_times_context(size):
+    from wagtail_extensions.blocks import OpeningTimesBlock
+
+    block = OpeningTimesBlock()
+    times = [
+        {'weekday': i % 7, 'start': '09:00:00', 'end': '17:00:00', 'closed': False}
+        for i in range(size['opening_times'])
+    ]
+    # A run of upcoming dates, so some fall inside the next week
+    today = datetime.date.today()
+    times += [
+        {'date': (today + datetime.timedelta(days=i)).isoformat(), 'closed': True}
+        for i in range(size['opening_times'] // 7)
+    ]
+    raw = {'times': times}
+
+    def run():
+        block.get_context(block.to_python(raw))
+
+    return run
+
+
+@scenario
+def link_url(size):
+    from wagtail.core.models import Page
+    from wagtail_extensions.blocks import LinkBlock
+
+    root = get_root_page()
+    page = root.add_child(instance=Page(title='Linked', slug='linked-{}'.format(uuid.uuid4().hex)))
+    block = LinkBlock()
+    raws = []
+    for i in range(size['links']):
+        if i % 2:
+            link = {'type': 'page', 'value': page.pk}
+        else:
+            link = {'type': 'url', 'value': '/somewhere/{}/'.format(i)}
+        raws.append({'text': '', 'link': [link]})
+
+    def run():
+        for raw in raws:
+            block.to_python(raw).link_url
+
+    return run
+
+
+def make_locations(count):
+    locations = []
+    for i in range(count):
+        locations.append({
+            'type': 'location',
+            'id': str(uuid.uuid4()),
+            'value': {
+                'name': 'Location {}'.format(i),
+                'address': {'lines': ['{} High Street'.format(i), 'London']},
+                'point': 'SRID=4326;POINT({:.4f} {:.4f})'.format(-0.1 + i / 1000, 51.5 + i / 1000),
+                'departments': [
+                    {
+                        'name': 'Sales',
+                        'phones': ['+447528712345', '+44 20 7946 {:04d}'.format(i % 10000)],
+                        'email': 'sales{}@example.com'.format(i),
+                        'primary': True,
+                    },
+                ],
+                'opening_times': {
+                    'times': [
+                        {'weekday': day, 'start': '09:00:00', 'end': '17:00:00', 'closed': day > 4}
+                        for day in range(7)
+                    ],
+                },
+                'primary': i == count - 1,
+            },
+        })
+    return locations
+
+
+@scenario
+def locations_deserialize(size):
+    from testproject.testapp.models import ContactDetailsTestSetting
+
+    field = ContactDetailsTestSetting._meta.get_field('locations')
+    raw = json.dumps(make_locations(size['locations']))
+
+    def run():
+        for location in field.to_python(raw):
+            value = location.value
+            value['name'], value['point']
+            for department in value['departments']:
+                [phone.as_e164 for phone in department['phones']]
+            value['opening_times']['times']
+
+    return run
+
+
+@scenario
+def locations_primary(size):
+    from testproject.testapp.models import ContactDetailsTestSetting
+
+    field = ContactDetailsTestSetting._meta.get_field('locations')
+    raw = json.dumps(make_locations(size['locations']))
+
+    def run():
+        setting = ContactDetailsTestSetting(locations=field.to_python(raw))
+        setting.primary_location, setting.primary_department, setting.primary_phone
+
+    return run
+
+
+@scenario
+def true_or_nth(size):
+    from wagtail_extensions.utils import true_or_nth
+
+    items = list(range(size['true_or_nth']))
+    last = items[-1]
+
+    def run():
+        # A match at the end, no match, and a generator that can only be walked once
+        true_or_nth(items, lambda item: item == last, n=10)
+        true_or_nth(items, lambda item: item < 0, n=len(items) // 2)
+        true_or_nth((item for item in items), lambda item: item == last, n=10)
+
+    return run
+
+
+@scenario
+def contact_post(size):
+    from django.contrib.messages.storage.fallback import FallbackStorage
+    from django.contrib.sessions.backends.cache import SessionStore
+    from django.test import RequestFactory
+    from testproject.testapp.models import ContactPage
+
+    page = get_root_page().add_child(instance=ContactPage(
+        title='Contact', slug='contact-{}'.format(uuid.uuid4().hex), enquiry_email='enquiries@example.com'))
+    form_data = {
+        'name': 'Alice',
+        'email': 'alice@example.com',
+        'message': 'Where is Bob?',
+    }
+    factory = RequestFactory()
+
+    def run():
+        request = factory.post(page.url, form_data)
+        request.session = SessionStore()
+        request._messages = FallbackStorage(request)
+        response = page.serve(request)
+        assert response.status_code == 302, response.status_code
+
+    return run
+
+
+def run_benchmarks(size_name, names, rounds):
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    call_command('migrate', verbosity=0, interactive=False)
+
+    size = SIZES[size_name]
+    results = {}
+    for name in names:
+        results[name] = measure(SCENARIOS[name](size), rounds)
+        print_result(name, results[name])
+    return results
+
+
+def get_meta(size_name):
+    import django
+    import wagtail
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        package_version = version('regulus-wagtail-extensions')
+    except PackageNotFoundError:
+        package_version = None
+
+    return {
+        'size': size_name,
+        'date': datetime.datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'wagtail': wagtail.__version__,
+        'version': package_version,
+    }
+
+
+def print_result(name, result):
+    print('{:<24} {:>10.2f} ms {:>6} queries {:>10.1f} KiB'.format(
+        name, result['median'] * 1000, result['queries'], result['peak_memory'] / 1024))
+
+
+def compare(baseline, results, threshold):
+    """
+    Prints the change in each scenario from baseline, and returns the names
+    of those whose median time grew by more than threshold.
+    """
+    regressions = []
+    print()
+    print('{:<24} {:>12} {:>12} {:>8} {:>14}'.format('scenario', 'baseline ms', 'current ms', 'change', 'queries'))
+    for name, result in results.items():
+        old = baseline['results'].get(name)
+        if old is None:
+            print('{:<24} {:>12} {:>12.2f}'.format(name, '-', result['median'] * 1000))
+            continue
+        change = result['median'] / old['median'] - 1
+        print('{:<24} {:>12.2f} {:>12.2f} {:>+7.1%} {:>6} -> {:<6}'.format(
+            name, old['median'] * 1000, result['median'] * 1000, change, old['queries'], result['queries']))
+        if change > threshold or result['queries'] > old['queries']:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', choices=SIZES, default='medium')
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), dest='scenarios',
+                        help='Run only this scenario; may be repeated')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Compare the results with this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Fractional slowdown counted as a regression when comparing (default 0.25)')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['meta']['size'] != args.size:
+            parser.error('{} was run with --size {}'.format(args.compare, baseline['meta']['size']))
+
+    results = run_benchmarks(args.size, args.scenarios or list(SCENARIOS), args.rounds)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'meta': get_meta(args.size), 'results': results}, f, indent=2)
+
+    if baseline:
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print('\nRegressed: {}'.format(', '.join(regressions)))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -26,12 +26,10 @@ setup(
         'wagtail>=2.11,<3',
         'django-phonenumber-field',
         'phonenumbers',
-        'python-dateutil',
         'wagtailgeowidget',
         # contact
         'django-recaptcha>=3.0,<3.1',
         'django-crispy-forms>=1.12',
-        'bleach>=2.0.0',
     ],
     extras_require={
         'test': test_requires,
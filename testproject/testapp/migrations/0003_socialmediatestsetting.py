@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-19 13:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+import wagtail.core.blocks
+import wagtail.core.fields
+import wagtail_extensions.blocks
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtailcore', '0066_collection_management_permissions'),
+        ('testapp', '0002_contactpage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SocialMediaTestSetting',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('profiles', wagtail.core.fields.StreamField([('profile', wagtail.core.blocks.StructBlock([('icon', wagtail.core.blocks.ChoiceBlock(choices=wagtail_extensions.blocks.get_social_media_types)), ('url', wagtail.core.blocks.URLBlock())]))])),
+                ('site', models.OneToOneField(editable=False, on_delete=django.db.models.deletion.CASCADE, to='wagtailcore.site')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
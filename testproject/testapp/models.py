@@ -1,6 +1,6 @@
 from wagtail.core.models import Page
 
-from wagtail_extensions.models import ContactDetailsSetting
+from wagtail_extensions.models import ContactDetailsSetting, SocialMediaSetting
 from wagtail_extensions.mixins import ContactMixin
 
 
@@ -10,3 +10,7 @@ class ContactPage(ContactMixin, Page):
 
 class ContactDetailsTestSetting(ContactDetailsSetting):
     pass
+
+
+class SocialMediaTestSetting(SocialMediaSetting):
+    pass
@@ -133,3 +133,7 @@ EMAIL_SUBJECT_PREFIX = 'Admin'
 MANAGERS = (
     ('admin', 'admin@localhost.com'),
 )
+
+# Wagtail extensions settings
+
+WAGTAIL_EXTENSIONS_STATIC_MAP_RENDERER = 'wagtail_extensions.maps.PlaceholderStaticMapRenderer'
@@ -0,0 +1,26 @@
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """
+    Clears the cache after each test, so cached settings, indexes and pages
+    don't leak into the next one.
+    """
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def location_data():
+    """
+    Returns a location as stored in ContactDetailsSetting.locations.
+    """
+    return {
+        'name': 'Nairobi',
+        'point': 'SRID=4326;POINT(36.8 -1.3)',
+        'primary': True,
+        'departments': [{'name': 'Sales', 'phones': ['+447528712345'], 'primary': True}],
+        'opening_times': {'times': [{'weekday': 1, 'start': '09:00', 'end': '17:00'}]},
+    }
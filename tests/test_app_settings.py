@@ -0,0 +1,64 @@
+import datetime
+import json
+
+import pytest
+from django.test import override_settings
+
+from wagtail_extensions import app_settings
+from wagtail_extensions.blocks import SocialMediaProfileBlock
+from wagtail_extensions.holidays import is_public_holiday
+from wagtail_extensions.templatetags.wagtailextensions_tags import map, map_assets
+
+
+def test_default():
+    assert app_settings.STATIC_MAP_SIZE == (640, 320)
+
+
+def test_unknown_setting():
+    with pytest.raises(AttributeError):
+        app_settings.NOT_A_SETTING
+
+
+def test_value_is_memoised(settings):
+    settings.WAGTAIL_EXTENSIONS_STATIC_MAP_SIZE = (100, 50)
+    assert app_settings.STATIC_MAP_SIZE == (100, 50)
+    assert vars(app_settings)['STATIC_MAP_SIZE'] == (100, 50)
+
+
+def test_setting_changed():
+    assert app_settings.GEO_WIDGET_ZOOM == 7
+    with override_settings(GEO_WIDGET_ZOOM=12):
+        assert app_settings.GEO_WIDGET_ZOOM == 12
+    assert app_settings.GEO_WIDGET_ZOOM == 7
+
+
+def test_setting_changed_only_forgets_that_setting(settings):
+    app_settings.STATIC_MAP_SIZE
+    settings.GEO_WIDGET_ZOOM = 12
+    assert 'STATIC_MAP_SIZE' in vars(app_settings)
+
+
+def test_map_tags_read_settings_when_called(settings):
+    settings.GEO_WIDGET_ZOOM = 12
+    settings.GOOGLE_MAPS_V3_APIKEY = 'abc'
+    assert map({'lat': -1.3, 'lng': 36.8})['zoom'] == 12
+    assert map({'lat': -1.3, 'lng': 36.8}, zoom=3)['zoom'] == 3
+    assert map_assets()['api_key'] == 'abc'
+
+
+def test_social_media_types(settings):
+    block = SocialMediaProfileBlock()
+    settings.SOCIAL_MEDIA_TYPES = (('mastodon', 'Mastodon'),)
+    assert list(block.child_blocks['icon'].field.choices)[1:] == [('mastodon', 'Mastodon')]
+
+
+def test_holiday_file_setting(tmp_path):
+    path = tmp_path / 'holidays.json'
+    path.write_text(json.dumps({'gb-eaw': ['2017-12-27']}))
+    christmas = datetime.date(2026, 12, 25)
+    with override_settings(WAGTAIL_EXTENSIONS_HOLIDAY_REGION='gb-eaw'):
+        with override_settings(WAGTAIL_EXTENSIONS_HOLIDAY_FILE=str(path)):
+            assert is_public_holiday(datetime.date(2017, 12, 27))
+            assert not is_public_holiday(christmas)
+        # Back to the bundled file
+        assert is_public_holiday(christmas)
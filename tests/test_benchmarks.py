@@ -0,0 +1,39 @@
+import importlib.util
+import os
+
+import pytest
+
+
+def load_benchmarks():
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'benchmarks', 'run.py')
+    spec = importlib.util.spec_from_file_location('benchmarks_run', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+benchmarks = load_benchmarks()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', sorted(benchmarks.SCENARIOS))
+def test_scenario(name):
+    func = benchmarks.SCENARIOS[name](benchmarks.SIZES['small'])
+    result = benchmarks.measure(func, rounds=1)
+    assert result['median'] > 0
+    assert result['peak_memory'] > 0
+
+
+def test_compare():
+    baseline = {'results': {
+        'fast': {'median': 1.0, 'queries': 2},
+        'slow': {'median': 1.0, 'queries': 2},
+        'queries': {'median': 1.0, 'queries': 2},
+    }}
+    results = {
+        'fast': {'median': 0.5, 'queries': 2},
+        'slow': {'median': 1.5, 'queries': 2},
+        'queries': {'median': 1.0, 'queries': 3},
+        'new': {'median': 1.0, 'queries': 0},
+    }
+    assert benchmarks.compare(baseline, results, threshold=0.25) == ['slow', 'queries']
@@ -1,15 +1,23 @@
 import datetime
 import pytest
+import tracemalloc
 from unittest.mock import patch
 
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from freezegun import freeze_time
 from phonenumber_field.phonenumber import PhoneNumber
 
+from wagtail.core.blocks import StructValue
 from wagtail.core.models import Page
+from wagtail_extensions import clock
 from wagtail_extensions.blocks import (
-    DepartmentBlock, ImagesBlock, LinkBlock, OpeningTimeBlock, OpeningTimesBlock, PhoneBlock
+    CarouselBlock, DepartmentBlock, ImagesBlock, LazyGeoBlock, LinkBlock, LocationBlock, OpeningTimeBlock,
+    OpeningTimesBlock, OpeningTimeValue, PhoneBlock
 )
+from wagtail_extensions.phone import CachedPhoneNumber, parse_phone_number
+
+from testproject.testapp.models import ContactDetailsTestSetting
 
 
 @pytest.mark.django_db
@@ -166,6 +174,13 @@ def test_openingtime_block_clean_valid():
     openingtime.clean({'start': '08:00', 'end': '20:00', 'date': '2017-01-01'})
 
 
+def test_openingtime_block_clean_uses_clock_today():
+    openingtime = OpeningTimeBlock()
+    with freeze_time('2017-01-01 23:59') as frozen, clock.frozen_today():
+        frozen.move_to('2017-01-02 00:01')
+        openingtime.clean({'start': '08:00', 'end': '20:00', 'date': '2017-01-01'})
+
+
 def test_openingtime_block_to_python_empty():
     openingtime = OpeningTimeBlock()
     openingtime.to_python({'label': '', 'date': None, 'closed': False, 'start': None, 'end': None, 'weekday': ''})
@@ -222,6 +237,11 @@ def test_openingtime_block_next_date_public():
     assert OpeningTimeBlock.next_date({'weekday': 7}) is None
 
 
+@freeze_time("2017-12-13")
+def test_openingtime_block_next_date_blank_weekday():
+    assert OpeningTimeBlock.next_date({'weekday': ''}) == datetime.date(2017, 12, 13)
+
+
 def test_openingtimes_block_time_keyfunc_specific():
     openingtime = OpeningTimeBlock()
     value = openingtime.to_python({})
@@ -336,3 +356,337 @@ def test_images_block_get_context():
 def test_images_block_get_context_empty_list():
     block = ImagesBlock()
     assert block.get_context({})['column_width'] == 12
+
+
+def test_images_block_get_context_srcset():
+    block = ImagesBlock()
+    ctx = block.get_context({'images': ['an image', 'another image', 'yet another image']})
+    assert ctx['srcset_filters'] == ('fill-380x380', 'fill-720x720', 'fill-760x760')
+    assert ctx['sizes'] == '(min-width: 768px) 33.33vw, 100vw'
+
+
+def test_images_block_get_rendition_specs():
+    block = ImagesBlock()
+    specs = list(block.get_rendition_specs({'images': ['an image', None]}))
+    assert specs == [
+        ('an image', 'fill-400x400'),
+        ('an image', 'fill-570x570'),
+        ('an image', 'fill-720x720'),
+        ('an image', 'fill-1140x1140'),
+    ]
+
+
+def test_carousel_block_get_rendition_specs():
+    block = CarouselBlock()
+    value = {
+        'items': [{'image': 'first'}, {'image': 'second'}],
+        'show_thumbnails': True,
+    }
+    specs = list(block.get_rendition_specs(value))
+    assert specs[:5] == [
+        ('first', 'fill-1600x600'),
+        ('first', 'fill-800x300'),
+        ('first', 'fill-1200x450'),
+        ('first', 'fill-1600x600'),
+        ('first', 'fill-60x60'),
+    ]
+    assert len(specs) == 10
+
+
+def test_carousel_block_get_rendition_specs_single_item_no_thumbnails():
+    block = CarouselBlock()
+    value = {'items': [{'image': 'first'}], 'show_thumbnails': True}
+    specs = list(block.get_rendition_specs(value))
+    assert ('first', 'fill-60x60') not in specs
+
+
+def test_phone_block_to_python_cached():
+    phone = PhoneBlock()
+    parse_phone_number.cache_clear()
+    with patch.object(CachedPhoneNumber, 'from_string', wraps=CachedPhoneNumber.from_string) as mocked_parse:
+        first = phone.to_python('+447528712345')
+        second = phone.to_python('+447528712345')
+
+    assert first is second
+    mocked_parse.assert_called_once()
+
+
+def test_phone_block_to_python_precomputes_formats():
+    number = PhoneBlock().to_python('+447528712345')
+    assert number.__dict__['as_e164'] == '+447528712345'
+    assert number.__dict__['as_national'] == '07528 712345'
+
+
+def test_phone_block_to_python_invalid():
+    number = PhoneBlock().to_python('not a number')
+    assert not number.is_valid()
+    assert str(number) == 'not a number'
+
+
+def test_phone_block_to_python_region(settings):
+    parse_phone_number.cache_clear()
+    settings.PHONENUMBER_DEFAULT_REGION = 'GB'
+    assert PhoneBlock().to_python('07528 712345').as_e164 == '+447528712345'
+    settings.PHONENUMBER_DEFAULT_REGION = 'KE'
+    assert PhoneBlock().to_python('07528 712345').as_e164 != '+447528712345'
+
+
+
+def test_phone_block_field():
+    block = PhoneBlock(required=False, help_text='Landline')
+    assert not block.required
+    assert block.field.help_text == 'Landline'
+
+
+def test_blocks_lazy_imports():
+    from wagtail_extensions import blocks
+    from wagtailgeowidget.blocks import GeoBlock
+    assert blocks.GeoBlock is GeoBlock
+    with pytest.raises(AttributeError):
+        blocks.NotABlock
+    # Import these from wagtail_extensions.phone
+    with pytest.raises(AttributeError):
+        blocks.parse_phone_number
+
+
+@pytest.mark.parametrize('value', [
+    'SRID=4326;POINT(-0.1277583 51.5073509)',
+    {'lat': '51.5073509', 'lng': '-0.1277583', 'srid': '4326'},
+])
+def test_lazy_geo_block_to_python_matches_geo_block(value):
+    from wagtailgeowidget.blocks import GeoBlock
+    assert LazyGeoBlock().to_python(value) == GeoBlock().to_python(value)
+
+
+def test_lazy_geo_block_deconstruct():
+    assert LazyGeoBlock(required=False).deconstruct() == ('wagtailgeowidget.blocks.GeoBlock', (), {'required': False})
+
+
+def test_lazy_geo_block_form():
+    from wagtailgeowidget.blocks import GeoBlock
+    block = LazyGeoBlock(required=False)
+    block.set_name('point')
+    assert isinstance(block.geo_block, GeoBlock)
+    assert block.field is block.geo_block.field
+    assert block.get_form_state({'lat': 51.5, 'lng': -0.12}) == "SRID=4326;POINT(-0.12 51.5)"
+
+def test_lazy_struct_block_defers_children():
+    block = DepartmentBlock()
+    with patch.object(PhoneBlock, 'to_python') as mocked_to_python:
+        value = block.to_python({'name': 'Sales', 'phones': ['+447528712345'], 'primary': True})
+        assert value['name'] == 'Sales'
+        assert value.get('primary') is True
+        mocked_to_python.assert_not_called()
+
+        value['phones']
+        mocked_to_python.assert_called_once_with('+447528712345')
+
+
+def test_lazy_struct_block_missing_children_use_default():
+    value = DepartmentBlock().to_python({})
+    assert value['primary'] is False
+    assert value.get('email') is None
+
+
+def test_lazy_struct_value_mapping_access():
+    value = DepartmentBlock().to_python({'name': 'Sales', 'phones': ['+447528712345']})
+    assert dict(value)['phones'][0] == PhoneNumber.from_string('+447528712345')
+    assert list(value.values())[0] == 'Sales'
+    assert value == {'name': 'Sales', 'phones': value['phones'], 'email': None, 'primary': False}
+
+
+def test_lazy_struct_block_get_prep_value_keeps_unread_children():
+    block = DepartmentBlock()
+    raw = {'name': 'Sales', 'phones': ['+447528712345'], 'email': '', 'primary': False}
+    value = block.to_python(raw)
+    with patch.object(PhoneBlock, 'to_python') as mocked_to_python:
+        assert block.get_prep_value(value) == raw
+    mocked_to_python.assert_not_called()
+
+
+def test_lazy_struct_block_get_prep_value_converted_children():
+    block = DepartmentBlock()
+    value = block.to_python({'name': 'Sales', 'phones': ['', '+447528712345']})
+    value['phones']
+    assert block.get_prep_value(value)['phones'] == ['+447528712345']
+
+
+def test_openingtime_block_to_python_value_class():
+    value = OpeningTimeBlock().to_python({'weekday': '1', 'start': '09:00', 'closed': False})
+    assert isinstance(value, OpeningTimeValue)
+    assert value['start'] == datetime.time(9)
+    assert value.get('end') is None
+    assert value.get('missing', 'default') == 'default'
+    assert dict(value) == {
+        'weekday': 1, 'label': None, 'date': None, 'start': datetime.time(9), 'end': None, 'closed': False,
+    }
+
+
+def test_openingtime_block_bulk_to_python_cast_weekday():
+    values = OpeningTimeBlock().bulk_to_python([{'weekday': '5'}, {'weekday': '7'}])
+    assert values[0]['weekday'] == 5
+    assert values[1]['label'] == OpeningTimeBlock.PUBLIC_LABEL
+
+
+def test_openingtime_block_get_prep_value():
+    block = OpeningTimeBlock()
+    value = block.to_python({'weekday': '1', 'start': '09:00', 'end': '17:00'})
+    assert block.get_prep_value(value) == {
+        'weekday': 1, 'label': None, 'date': None,
+        'start': datetime.time(9), 'end': datetime.time(17), 'closed': False,
+    }
+
+
+def test_openingtime_value_memory():
+    """
+    A cached location list can hold thousands of opening times, so their
+    values should be much smaller than a StructValue.
+    """
+    block = OpeningTimeBlock()
+    items = [
+        ('weekday', 1), ('label', ''), ('date', None),
+        ('start', datetime.time(9)), ('end', datetime.time(17)), ('closed', False),
+    ]
+
+    def measure(value_class, n=1000):
+        tracemalloc.start()
+        try:
+            values = [value_class(block, items) for _ in range(n)]
+            return tracemalloc.get_traced_memory()[0] / n
+        finally:
+            tracemalloc.stop()
+
+    struct_value_size = measure(StructValue)
+    opening_time_value_size = measure(OpeningTimeValue)
+    assert opening_time_value_size * 4 < struct_value_size
+
+
+def test_openingtimes_block_get_time_for_date_public_holiday():
+    value = {
+        'times': [
+            {'weekday': 4, 'start': datetime.time(9)},
+            {'weekday': OpeningTimeBlock.PUBLIC, 'closed': True},
+        ],
+    }
+    # Christmas day 2026 is a Friday
+    christmas = datetime.date(2026, 12, 25)
+    assert OpeningTimesBlock.get_time_for_date(value, christmas)['weekday'] == 4
+    with patch('wagtail_extensions.holidays.app_settings.HOLIDAY_REGION', 'gb-eaw'):
+        assert OpeningTimesBlock.get_time_for_date(value, christmas)['closed'] is True
+        assert OpeningTimesBlock.get_time_for_date(value, datetime.date(2026, 12, 18))['weekday'] == 4
+
+
+def test_openingtimes_block_get_time_for_date_date_beats_public_holiday():
+    christmas = datetime.date(2026, 12, 25)
+    value = {
+        'times': [
+            {'weekday': OpeningTimeBlock.PUBLIC, 'closed': True},
+            {'date': christmas, 'start': datetime.time(10)},
+        ],
+    }
+    with patch('wagtail_extensions.holidays.app_settings.HOLIDAY_REGION', 'gb-eaw'):
+        assert OpeningTimesBlock.get_time_for_date(value, christmas)['date'] == christmas
+
+
+def test_openingtimes_block_iter_schedule_matches_get_time_for_date():
+    value = {
+        'times': [
+            {'weekday': 0, 'start': datetime.time(9), 'end': datetime.time(17)},
+            {'weekday': 1, 'start': datetime.time(9), 'end': datetime.time(17)},
+            {'weekday': 5, 'closed': True},
+            {'date': datetime.date(2017, 12, 19), 'closed': True},
+            {'weekday': OpeningTimeBlock.PUBLIC, 'closed': True},
+        ],
+    }
+    start, end = datetime.date(2017, 12, 1), datetime.date(2018, 1, 31)
+    schedule = list(OpeningTimesBlock.iter_schedule(value, start, end))
+
+    assert len(schedule) == 62
+    for date, opening_time in schedule:
+        expected = OpeningTimesBlock.get_time_for_date(value, date)
+        assert (dict(opening_time) if opening_time else None) == expected
+
+
+def test_openingtimes_block_iter_schedule_empty():
+    schedule = list(OpeningTimesBlock.iter_schedule(None, datetime.date(2017, 12, 1), datetime.date(2017, 12, 2)))
+    assert schedule == [(datetime.date(2017, 12, 1), None), (datetime.date(2017, 12, 2), None)]
+
+
+def test_openingtimes_block_group_schedule():
+    nine_to_five = {'start': datetime.time(9), 'end': datetime.time(17)}
+    christmas = {'date': datetime.date(2017, 12, 25), 'closed': True}
+    value = {
+        'times': [dict(nine_to_five, weekday=weekday) for weekday in range(5)] + [christmas],
+    }
+    # Friday 22nd to Friday 29th December 2017
+    runs = list(OpeningTimesBlock.group_schedule(value, datetime.date(2017, 12, 22), datetime.date(2017, 12, 29)))
+
+    assert [(first.day, last.day) for first, last, _ in runs] == [(22, 22), (23, 24), (25, 25), (26, 29)]
+    assert runs[1][2] is None
+    assert runs[2][2] is christmas
+
+
+@freeze_time('2017-12-22')
+def test_openingtimes_block_group_schedule_year_range():
+    value = {'times': [{'weekday': weekday, 'closed': weekday > 4} for weekday in range(7)]}
+    runs = list(OpeningTimesBlock.group_schedule(value, datetime.date(2018, 1, 1), datetime.date(2018, 12, 31)))
+    # A weekday run and a weekend run for each week
+    assert len(runs) == 105
+
+
+def test_location_block_cleans_unchanged_value_once(location_data):
+    block = LocationBlock()
+    cleaned = block.clean(block.to_python(location_data))
+
+    with patch.object(DepartmentBlock, 'clean') as mocked_clean:
+        again = block.clean(block.to_python(location_data))
+    mocked_clean.assert_not_called()
+    assert block.get_prep_value(again) == block.get_prep_value(cleaned)
+    assert again['opening_times']['times'][0]['start'] == datetime.time(9)
+
+
+def test_location_block_cleans_changed_value(location_data):
+    block = LocationBlock()
+    block.clean(block.to_python(location_data))
+
+    location_data['departments'][0]['phones'] = []
+    with pytest.raises(ValidationError):
+        block.clean(block.to_python(location_data))
+    # Invalid values aren't remembered
+    with pytest.raises(ValidationError):
+        block.clean(block.to_python(location_data))
+
+
+def test_location_block_cleans_again_daily(location_data):
+    block = LocationBlock()
+    location_data['opening_times']['times'].append({'date': '2017-06-07', 'start': '10:00', 'end': '12:00'})
+    with freeze_time('2017-06-06'):
+        block.clean(block.to_python(location_data))
+    with freeze_time('2017-06-08'), pytest.raises(ValidationError):
+        block.clean(block.to_python(location_data))
+
+
+def test_location_stream_cleans_with_one_cache_read_and_write(location_data):
+    stream_block = ContactDetailsTestSetting._meta.get_field('locations').stream_block
+    london = dict(location_data, name='London', primary=False)
+    value = stream_block.to_python([
+        {'type': 'location', 'value': location_data},
+        {'type': 'location', 'value': london},
+    ])
+    with patch('wagtail_extensions.blocks.cache', wraps=cache) as mocked_cache:
+        stream_block.clean(value)
+    mocked_cache.get.assert_not_called()
+    mocked_cache.set.assert_not_called()
+    assert mocked_cache.get_many.call_count == 1
+    assert len(mocked_cache.set_many.call_args[0][0]) == 2
+
+    location_data['name'] = 'Nairobi CBD'
+    value = stream_block.to_python([
+        {'type': 'location', 'value': location_data},
+        {'type': 'location', 'value': london},
+    ])
+    with patch.object(DepartmentBlock, 'clean', wraps=DepartmentBlock().clean) as mocked_clean:
+        cleaned = stream_block.clean(value)
+    # Only the changed location is validated
+    assert mocked_clean.call_count == 1
+    assert [child.value['name'] for child in cleaned] == ['Nairobi CBD', 'London']
@@ -0,0 +1,51 @@
+import datetime
+
+from freezegun import freeze_time
+
+from wagtail_extensions import clock
+
+
+@freeze_time('2017-12-13')
+def test_today():
+    assert clock.today() == datetime.date(2017, 12, 13)
+
+
+def test_frozen_today_across_midnight():
+    with freeze_time('2017-12-13 23:59:59') as frozen:
+        with clock.frozen_today():
+            frozen.tick(datetime.timedelta(seconds=2))
+            assert clock.today() == datetime.date(2017, 12, 13)
+        assert clock.today() == datetime.date(2017, 12, 14)
+
+
+def test_frozen_today_nested_keeps_outer_date():
+    with freeze_time('2017-12-13 23:59:59') as frozen:
+        with clock.frozen_today() as outer:
+            frozen.tick(datetime.timedelta(seconds=2))
+            with clock.frozen_today() as inner:
+                assert inner == outer == datetime.date(2017, 12, 13)
+
+
+def test_next_weekday_dates():
+    # A Wednesday
+    dates = clock.next_weekday_dates(datetime.date(2017, 12, 13))
+    assert dates == (
+        datetime.date(2017, 12, 18),
+        datetime.date(2017, 12, 19),
+        datetime.date(2017, 12, 13),
+        datetime.date(2017, 12, 14),
+        datetime.date(2017, 12, 15),
+        datetime.date(2017, 12, 16),
+        datetime.date(2017, 12, 17),
+    )
+
+
+def test_today_middleware(rf):
+    def get_response(request):
+        frozen.tick(datetime.timedelta(seconds=2))
+        return clock.today()
+
+    with freeze_time('2017-12-13 23:59:59') as frozen:
+        response = clock.TodayMiddleware(get_response)(rf.get('/'))
+
+    assert response == datetime.date(2017, 12, 13)
@@ -0,0 +1,115 @@
+import csv
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from wagtail.core.models import Site
+
+from testproject.testapp.models import ContactDetailsTestSetting
+
+
+MODEL = 'testapp.ContactDetailsTestSetting'
+
+CSV = (
+    'name,address,lat,lng,primary,department,phones,email,department_primary,weekday,label,date,start,end,closed\n'
+    'Nairobi,"1 Kenyatta Ave\nNairobi",-1.3,36.8,yes,Sales,+447528712345;+447528712346,,true,Monday,,,09:00,17:00,\n'
+    'Nairobi,"1 Kenyatta Ave\nNairobi",-1.3,36.8,yes,,,,,Saturday,,,,,true\n'
+    'London,,51.5,-0.12,,Support,,support@example.com,,,,,,,\n'
+)
+
+
+@pytest.fixture
+def site(db):
+    return Site.objects.get(is_default_site=True)
+
+
+def write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+    return str(path)
+
+
+def test_import_csv(site, tmp_path):
+    call_command('contact_locations', 'import', MODEL, write(tmp_path, 'locations.csv', CSV), workers=1)
+
+    setting = ContactDetailsTestSetting.for_site(site)
+    nairobi, london = [item.value for item in setting.locations]
+    assert nairobi['name'] == 'Nairobi'
+    assert list(nairobi['address']['lines']) == ['1 Kenyatta Ave', 'Nairobi']
+    assert nairobi['primary'] is True
+    assert [str(phone) for phone in nairobi['departments'][0]['phones']] == ['+447528712345', '+447528712346']
+    times = nairobi['opening_times']['times']
+    assert [(time['weekday'], time['closed']) for time in times] == [(0, False), (5, True)]
+    assert london['departments'][0]['email'] == 'support@example.com'
+    assert setting.nearest_locations(51.5, -0.1)[0][1].value['name'] == 'London'
+
+
+def test_import_errors(site, tmp_path, capsys):
+    content = CSV + 'Mombasa,,-4,39.7,,Sales,,,,Funday,,,,,\nKisumu,,-0.1,34.8,,Sales,,,,,,,,,\n'
+    with pytest.raises(CommandError, match='2 of 4 locations are invalid'):
+        call_command('contact_locations', 'import', MODEL, write(tmp_path, 'locations.csv', content), workers=1)
+
+    errors = capsys.readouterr().err
+    assert "Line 7: Unknown weekday 'Funday'" in errors
+    assert 'Line 8: departments.0.phone: Either a phone or email must be defined' in errors
+    assert not ContactDetailsTestSetting.objects.filter(site=site).exists()
+
+
+def test_import_dry_run(site, tmp_path, capsys):
+    call_command('contact_locations', 'import', MODEL, write(tmp_path, 'locations.csv', CSV), workers=1, dry_run=True)
+    assert '2 locations are valid' in capsys.readouterr().out
+    assert not ContactDetailsTestSetting.objects.filter(site=site).exists()
+
+
+def test_import_in_worker_processes(site, tmp_path, location_data):
+    lines = [json.dumps(dict(location_data, name='Branch {}'.format(i), primary=i == 0)) for i in range(20)]
+    path = write(tmp_path, 'locations.jsonl', '\n'.join(lines))
+    call_command('contact_locations', 'import', MODEL, path, workers=2, chunk_size=5)
+
+    setting = ContactDetailsTestSetting.for_site(site)
+    assert [item.value['name'] for item in setting.locations] == ['Branch {}'.format(i) for i in range(20)]
+
+
+def test_import_append(site, tmp_path):
+    path = write(tmp_path, 'locations.csv', CSV)
+    call_command('contact_locations', 'import', MODEL, path, workers=1)
+    call_command('contact_locations', 'import', MODEL, path, workers=1, append=True)
+    assert len(ContactDetailsTestSetting.for_site(site).locations) == 4
+
+
+def test_export_round_trip(site, tmp_path):
+    call_command('contact_locations', 'import', MODEL, write(tmp_path, 'locations.csv', CSV), workers=1)
+
+    csv_path = str(tmp_path / 'export.csv')
+    call_command('contact_locations', 'export', MODEL, csv_path)
+    with open(csv_path, newline='') as file:
+        rows = list(csv.DictReader(file))
+    assert [row['name'] for row in rows] == ['Nairobi', 'Nairobi', 'London']
+    assert rows[0]['phones'] == '+447528712345;+447528712346'
+    assert rows[1]['weekday'] == 'Saturday'
+
+    jsonl_path = str(tmp_path / 'export.jsonl')
+    call_command('contact_locations', 'export', MODEL, jsonl_path)
+    stored = [item['value'] for item in ContactDetailsTestSetting.for_site(site).locations.raw_data]
+    with open(jsonl_path) as file:
+        assert [json.loads(line) for line in file] == stored
+
+    # Importing the CSV export gives the same locations
+    call_command('contact_locations', 'import', MODEL, csv_path, workers=1)
+    call_command('contact_locations', 'export', MODEL, csv_path)
+    with open(csv_path, newline='') as file:
+        assert list(csv.DictReader(file)) == rows
+
+
+def test_not_a_contact_details_setting(site):
+    with pytest.raises(CommandError, match='is not a ContactDetailsSetting'):
+        call_command('contact_locations', 'export', 'wagtailcore.Page')
+
+
+def test_no_default_site(site):
+    Site.objects.update(is_default_site=False)
+    with pytest.raises(CommandError, match='There is no default site'):
+        call_command('contact_locations', 'export', MODEL)
+    with pytest.raises(CommandError, match='No site 0'):
+        call_command('contact_locations', 'export', MODEL, site='0')
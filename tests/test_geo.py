@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+from wagtail_extensions.geo import LocationIndex, haversine, parse_point
+
+
+@pytest.fixture
+def points():
+    rng = random.Random(1234)
+    return [(i, rng.uniform(-60, 60), rng.uniform(-180, 180)) for i in range(2000)]
+
+
+def brute_force(points, lat, lng):
+    return sorted((haversine(lat, lng, p_lat, p_lng), key) for key, p_lat, p_lng in points)
+
+
+def test_parse_point_stored():
+    assert parse_point('SRID=4326;POINT(36.8 -1.3)') == (-1.3, 36.8)
+
+
+def test_parse_point_dict():
+    assert parse_point({'lat': '-1.3', 'lng': '36.8', 'srid': '4326'}) == (-1.3, 36.8)
+
+
+@pytest.mark.parametrize('value', [None, '', 'nonsense', {}, {'lat': 'x', 'lng': 1}])
+def test_parse_point_invalid(value):
+    assert parse_point(value) is None
+
+
+def test_haversine():
+    # London to Paris
+    assert haversine(51.5074, -0.1278, 48.8566, 2.3522) == pytest.approx(343.5, abs=1)
+
+
+def test_location_index_empty():
+    index = LocationIndex([])
+    assert index.nearest(0, 0) == []
+    assert index.within(0, 0, 100) == []
+
+
+def test_location_index_nearest_matches_brute_force(points):
+    index = LocationIndex(points)
+    for lat, lng in [(0, 0), (51.5, -0.1), (-33.9, 151.2), (59, 179.9)]:
+        expected = brute_force(points, lat, lng)[:5]
+        found = index.nearest(lat, lng, k=5)
+        assert [key for _, key in found] == [key for _, key in expected]
+        assert [d for d, _ in found] == pytest.approx([d for d, _ in expected])
+
+
+def test_location_index_nearest_more_than_available():
+    index = LocationIndex([(1, 0, 0), (2, 10, 10)])
+    assert [key for _, key in index.nearest(80, 80, k=5)] == [2, 1]
+
+
+def test_location_index_within_matches_brute_force(points):
+    index = LocationIndex(points)
+    expected = [(d, key) for d, key in brute_force(points, 10, 20) if d <= 1500]
+    found = index.within(10, 20, 1500)
+    assert [key for _, key in found] == [key for _, key in expected]
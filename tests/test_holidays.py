@@ -0,0 +1,67 @@
+import datetime
+import json
+from unittest.mock import patch
+
+import pytest
+
+from wagtail_extensions import app_settings
+from wagtail_extensions.holidays import BaseHolidayCalendar, StaticHolidayCalendar, is_public_holiday
+
+
+@pytest.fixture
+def holiday_file(tmp_path):
+    path = tmp_path / 'holidays.json'
+    path.write_text(json.dumps({'test': ['2017-12-26', '2017-12-25', '2018-01-01']}))
+    return str(path)
+
+
+def test_static_holiday_calendar(holiday_file):
+    calendar = StaticHolidayCalendar(path=holiday_file)
+    assert calendar.is_holiday(datetime.date(2017, 12, 25), 'test')
+    assert calendar.is_holiday(datetime.date(2018, 1, 1), 'test')
+    assert not calendar.is_holiday(datetime.date(2017, 12, 27), 'test')
+    assert not calendar.is_holiday(datetime.date(2018, 1, 2), 'test')
+    assert not calendar.is_holiday(datetime.date(2017, 12, 25), 'other')
+
+
+def test_static_holiday_calendar_bundled_file():
+    calendar = StaticHolidayCalendar()
+    assert calendar.is_holiday(datetime.date(2026, 12, 28), 'gb-eaw')
+
+
+def test_holiday_calendar_sorts_once():
+    class Calendar(BaseHolidayCalendar):
+        get_holidays = staticmethod(lambda region: [datetime.date(2018, 1, 1), datetime.date(2017, 12, 25)])
+
+    calendar = Calendar()
+    with patch.object(calendar, 'get_holidays', wraps=calendar.get_holidays) as mocked_get:
+        calendar.is_holiday(datetime.date(2017, 12, 25), 'test')
+        calendar.is_holiday(datetime.date(2017, 12, 26), 'test')
+    mocked_get.assert_called_once_with('test')
+    assert calendar.get_sorted_holidays('test') == (datetime.date(2017, 12, 25), datetime.date(2018, 1, 1))
+
+
+def test_is_public_holiday_without_region():
+    assert not is_public_holiday(datetime.date(2026, 12, 25))
+
+
+def test_is_public_holiday_with_region():
+    with patch.object(app_settings, 'HOLIDAY_REGION', 'gb-eaw'):
+        assert is_public_holiday(datetime.date(2026, 12, 25))
+
+
+def test_holiday_calendar_warns_outside_its_years(holiday_file, caplog):
+    calendar = StaticHolidayCalendar(path=holiday_file)
+    with caplog.at_level('WARNING', logger='wagtail_extensions.holidays'):
+        calendar.is_holiday(datetime.date(2017, 12, 25), 'test')
+        assert not caplog.records
+
+        calendar.is_holiday(datetime.date(2019, 1, 1), 'test')
+        calendar.is_holiday(datetime.date(2019, 1, 2), 'test')
+        calendar.check_years('test', datetime.date(2018, 12, 1), datetime.date(2020, 1, 31))
+        calendar.is_holiday(datetime.date(2019, 1, 1), 'other')
+    assert [record.getMessage() for record in caplog.records] == [
+        'No public holidays known for test in 2019; set WAGTAIL_EXTENSIONS_HOLIDAY_FILE to a file that has them',
+        'No public holidays known for test in 2020; set WAGTAIL_EXTENSIONS_HOLIDAY_FILE to a file that has them',
+        'No public holidays known for other in 2019; set WAGTAIL_EXTENSIONS_HOLIDAY_FILE to a file that has them',
+    ]
@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+# Imported when blocks are edited or rendered, but never when loading them
+DEFERRED_MODULES = [
+    'bleach',
+    'dateutil',
+    'django.contrib.gis.gdal',
+    'phonenumbers',
+    'wagtailgeowidget.blocks',
+]
+
+
+def import_times(statement):
+    """
+    Runs statement in a fresh interpreter under -X importtime, and returns the
+    cumulative import time in microseconds of each module it imported.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import django; django.setup(); ' + statement],
+        env=env, stderr=subprocess.PIPE, universal_newlines=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line.split('|')
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize('statement', [
+    'import wagtail_extensions.blocks',
+    'import wagtail_extensions.templatetags.wagtailextensions_tags',
+])
+def test_import_defers_heavy_modules(statement):
+    times = import_times(statement)
+    assert 'wagtail_extensions.blocks' in times
+    assert not [name for name in DEFERRED_MODULES if name in times]
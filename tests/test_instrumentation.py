@@ -0,0 +1,134 @@
+from unittest import mock
+
+import pytest
+from django.http import HttpResponse
+from django.template import engines
+from wagtail.core.models import Page
+
+from wagtail_extensions import instrumentation
+from wagtail_extensions.blocks import TextBlock
+from wagtail_extensions.instrumentation import ServerTimingMiddleware, Timing, timing_recorded
+
+
+@pytest.fixture
+def timings():
+    recorded = []
+
+    def receiver(timing, **kwargs):
+        recorded.append(timing)
+
+    timing_recorded.connect(receiver)
+    yield recorded
+    timing_recorded.disconnect(receiver)
+
+
+@pytest.fixture
+def instrumented(settings):
+    settings.WAGTAIL_EXTENSIONS_INSTRUMENTATION = True
+
+
+def render(template_string, context=None):
+    template = engines['django'].from_string('{% load wagtailextensions_tags %}' + template_string)
+    return template.render(context)
+
+
+def test_disabled(timings):
+    assert render('{% metablock %}Hello{% endmetablock %}') == 'Hello'
+    assert instrumentation.call('test', lambda: 5) == 5
+    assert timings == []
+
+
+def test_call(instrumented, timings):
+    assert instrumentation.call('test', lambda x: x * 2, 5) == 10
+    [timing] = timings
+    assert timing.name == 'test'
+    assert timing.duration > 0
+    assert timing.queries == 0
+
+
+def test_call_records_exceptions(instrumented, timings):
+    with pytest.raises(ZeroDivisionError):
+        instrumentation.call('test', lambda: 1 / 0)
+    assert [timing.name for timing in timings] == ['test']
+
+
+@pytest.mark.django_db
+def test_call_counts_queries(instrumented, timings):
+    instrumentation.call('test', lambda: list(Page.objects.all()))
+    assert timings[0].queries == 1
+
+
+def test_tag(instrumented, timings):
+    assert render('{% metablock %}Hello{% endmetablock %}') == 'Hello'
+    assert [timing.name for timing in timings] == ['tag.metablock']
+
+
+@pytest.mark.django_db
+def test_inclusion_tag_includes_template_queries(instrumented, timings, rf):
+    root = Page.objects.get(url_path='/home/')
+    root.add_child(instance=Page(title='Child', slug='child', show_in_menus=True))
+    render('{% menu root %}', {'root': root, 'request': rf.get('/')})
+    [timing] = timings
+    assert timing.name == 'tag.menu'
+    # The menu's querysets are evaluated while rendering its template
+    assert timing.queries >= 2
+
+
+def test_block(instrumented, timings):
+    block = TextBlock()
+    block.render(block.to_python({'title': 'Title', 'body': '<p>Body</p>'}))
+    assert [timing.name for timing in timings] == ['block.TextBlock']
+
+
+def test_sink(instrumented, settings):
+    sink = mock.Mock()
+    with mock.patch('wagtail_extensions.tests_sink', sink, create=True):
+        settings.WAGTAIL_EXTENSIONS_INSTRUMENTATION_SINK = 'wagtail_extensions.tests_sink'
+        instrumentation.call('test', lambda: None)
+    sink.assert_called_once()
+    assert sink.call_args[0][0].name == 'test'
+
+
+def test_default_sink_logs(instrumented, caplog):
+    caplog.set_level('DEBUG', logger='wagtail_extensions.instrumentation')
+    instrumentation.call('test', lambda: None)
+    assert 'test took' in caplog.text
+
+
+def test_server_timing_middleware(instrumented, rf):
+    def view(request):
+        instrumentation.call('tag.menu', lambda: None)
+        instrumentation.call('tag.menu', lambda: None)
+        instrumentation.call('block.TextBlock', lambda: None)
+        return HttpResponse()
+
+    response = ServerTimingMiddleware(view)(rf.get('/'))
+    metrics = response['Server-Timing'].split(', ')
+    assert metrics[0].startswith('tag.menu;dur=')
+    assert metrics[0].endswith(';desc="2 calls / 0 queries"')
+    assert metrics[1].startswith('block.TextBlock;dur=')
+
+
+def test_server_timing_middleware_disabled(rf):
+    def view(request):
+        instrumentation.call('tag.menu', lambda: None)
+        return HttpResponse()
+
+    response = ServerTimingMiddleware(view)(rf.get('/'))
+    assert not response.has_header('Server-Timing')
+
+
+def test_server_timing_middleware_appends(instrumented, rf):
+    def view(request):
+        instrumentation.call('tag.menu', lambda: None)
+        response = HttpResponse()
+        response['Server-Timing'] = 'db;dur=1'
+        return response
+
+    response = ServerTimingMiddleware(view)(rf.get('/'))
+    assert response['Server-Timing'].startswith('db;dur=1, tag.menu;dur=')
+
+
+def test_get_metrics():
+    metrics = list(ServerTimingMiddleware.get_metrics([Timing('a', 0.001, 1), Timing('a', 0.002, 2)]))
+    assert metrics == ['a;dur=3.00;desc="2 calls / 3 queries"']
@@ -0,0 +1,58 @@
+from unittest.mock import patch
+from urllib.error import URLError
+
+import pytest
+from django.core.cache import cache
+
+from wagtail_extensions.maps import GoogleStaticMapRenderer, PlaceholderStaticMapRenderer, get_static_map_url
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    return tmp_path
+
+
+def test_placeholder_renderer_png():
+    out = PlaceholderStaticMapRenderer().render(-1.3, 36.8, 10, 20, 10)
+    assert out.startswith(b'\x89PNG\r\n\x1a\n')
+    assert out.endswith(b'IEND\xaeB`\x82')
+
+
+def test_get_static_map_url_stores_image(media_root):
+    url = get_static_map_url({'lat': '-1.3', 'lng': '36.8'}, 10)
+    files = list((media_root / 'wagtail_extensions' / 'maps').iterdir())
+    assert len(files) == 1
+    assert url.endswith(files[0].name)
+
+
+def test_get_static_map_url_renders_once(media_root):
+    location = {'lat': -1.3, 'lng': 36.8}
+    with patch.object(PlaceholderStaticMapRenderer, 'render', return_value=b'png') as mocked_render:
+        first = get_static_map_url(location, 10)
+        second = get_static_map_url(location, 10)
+        get_static_map_url(location, 12)
+
+    assert first == second
+    assert mocked_render.call_count == 2
+
+
+def test_get_static_map_url_storage_survives_cache_clear(media_root):
+    location = {'lat': -1.3, 'lng': 36.8}
+    get_static_map_url(location, 10)
+    cache.clear()
+    with patch.object(PlaceholderStaticMapRenderer, 'render') as mocked_render:
+        get_static_map_url(location, 10)
+    mocked_render.assert_not_called()
+
+
+def test_get_static_map_url_render_failure(media_root, settings):
+    settings.WAGTAIL_EXTENSIONS_STATIC_MAP_RENDERER = 'wagtail_extensions.maps.GoogleStaticMapRenderer'
+    location = {'lat': -1.3, 'lng': 36.8}
+    with patch('wagtail_extensions.maps.urlopen', side_effect=URLError('timed out')):
+        assert get_static_map_url(location, 10) is None
+    assert not (media_root / 'wagtail_extensions' / 'maps').exists()
+
+    # Not cached, so it's tried again
+    with patch.object(GoogleStaticMapRenderer, 'render', return_value=b'png'):
+        assert get_static_map_url(location, 10).endswith('.png')
@@ -0,0 +1,66 @@
+import pytest
+from django.urls import NoReverseMatch
+from unittest import mock
+
+from wagtail.core.models import Page, PageViewRestriction
+from wagtail_extensions import menus
+
+
+@pytest.fixture
+def section(db):
+    root = Page.objects.get(url_path='/home/')
+    section = root.add_child(instance=Page(title='Section', slug='section', show_in_menus=True, live=True))
+    return section
+
+
+def test_tree_version_is_stable(section):
+    assert menus.get_tree_version() == menus.get_tree_version()
+
+
+def test_tree_version_changes_on_publish(section, django_capture_on_commit_callbacks):
+    version = menus.get_tree_version()
+    with django_capture_on_commit_callbacks(execute=True):
+        section.save_revision().publish()
+    assert menus.get_tree_version() != version
+
+
+def test_tree_version_changes_on_unpublish(section, django_capture_on_commit_callbacks):
+    version = menus.get_tree_version()
+    with django_capture_on_commit_callbacks(execute=True):
+        section.unpublish()
+    assert menus.get_tree_version() != version
+
+
+def test_tree_version_changes_on_delete(section, django_capture_on_commit_callbacks):
+    version = menus.get_tree_version()
+    with django_capture_on_commit_callbacks(execute=True):
+        section.delete()
+    assert menus.get_tree_version() != version
+
+
+def test_tree_version_changes_on_view_restriction(section, django_capture_on_commit_callbacks):
+    version = menus.get_tree_version()
+    with django_capture_on_commit_callbacks(execute=True):
+        restriction = PageViewRestriction.objects.create(
+            page=section, restriction_type=PageViewRestriction.PASSWORD, password='x')
+    assert menus.get_tree_version() != version
+
+    version = menus.get_tree_version()
+    with django_capture_on_commit_callbacks(execute=True):
+        restriction.delete()
+    assert menus.get_tree_version() != version
+
+
+def test_children_url(section):
+    assert menus.get_children_url(section, 'abc') is None
+
+    section.add_child(instance=Page(title='Child', slug='child', live=True))
+    section.refresh_from_db()
+    assert menus.get_children_url(section, 'abc') == '/wagtail-extensions/menu/{}/?v=abc'.format(section.pk)
+
+
+def test_children_url_without_urls(section):
+    section.add_child(instance=Page(title='Child', slug='child', live=True))
+    section.refresh_from_db()
+    with mock.patch('wagtail_extensions.menus.reverse', side_effect=NoReverseMatch):
+        assert menus.get_children_url(section, 'abc') is None
@@ -0,0 +1,128 @@
+from unittest import mock
+
+import pytest
+
+from wagtail_extensions import metrics
+from wagtail_extensions.metrics import Counter, Histogram, Registry
+
+from testproject.testapp.models import ContactPage
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    metrics.registry.clear()
+    yield
+    metrics.registry.clear()
+
+
+def test_counter():
+    counter = Counter('things_total', 'Things', labelnames=['kind'])
+    counter.inc(kind='a')
+    counter.inc(2, kind='a')
+    counter.inc(kind='b')
+    assert counter.get(kind='a') == 3
+    assert list(counter.expose()) == [
+        '# HELP things_total Things',
+        '# TYPE things_total counter',
+        'things_total{kind="a"} 3',
+        'things_total{kind="b"} 1',
+    ]
+
+
+def test_counter_labels_must_match():
+    counter = Counter('things_total', 'Things', labelnames=['kind'])
+    with pytest.raises(ValueError):
+        counter.inc(colour='red')
+
+
+def test_histogram():
+    histogram = Histogram('latency_seconds', 'Latency', buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+    assert histogram.get_count() == 4
+    assert list(histogram.expose())[2:] == [
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        'latency_seconds_sum 3.65',
+        'latency_seconds_count 4',
+    ]
+
+
+def test_histogram_time():
+    histogram = Histogram('latency_seconds', 'Latency', labelnames=['stage'])
+    with pytest.raises(ZeroDivisionError):
+        with histogram.time(stage='divide'):
+            1 / 0
+    assert histogram.get_count(stage='divide') == 1
+
+
+def test_label_values_are_escaped():
+    counter = Counter('things_total', 'Things', labelnames=['kind'])
+    counter.inc(kind='say "hi"\n')
+    assert list(counter.expose())[-1] == 'things_total{kind="say \\"hi\\"\\n"} 1'
+
+
+def test_registry():
+    registry = Registry()
+    registry.counter('things_total', 'Things').inc()
+    with pytest.raises(ValueError):
+        registry.counter('things_total', 'Things')
+    assert registry.expose().endswith('things_total 1\n')
+    registry.clear()
+    assert registry.expose().endswith('counter\n')
+
+
+def test_contact_stage_failure():
+    with pytest.raises(ValueError):
+        with metrics.contact_stage('store'):
+            raise ValueError
+    assert metrics.contact_stage_failures.get(stage='store') == 1
+    assert metrics.contact_stage_seconds.get_count(stage='store') == 1
+
+
+def post(rf, data):
+    request = rf.post('/', data)
+    request._messages = mock.MagicMock()
+    request.session = mock.MagicMock()
+    return ContactPage().serve(request)
+
+
+@pytest.mark.django_db
+def test_contact_submission_sent(rf, mailoutbox):
+    post(rf, {'name': 'Alice', 'email': 'alice@example.com', 'message': 'Where is Bob?'})
+    assert len(mailoutbox) == 1
+    assert metrics.contact_submissions.get(outcome='sent') == 1
+    for stage in ('submission', 'validation', 'email_render', 'email_send', 'store'):
+        assert metrics.contact_stage_seconds.get_count(stage=stage) == 1
+
+
+@pytest.mark.django_db
+def test_contact_submission_invalid(rf):
+    # Skip rendering the page with the form errors
+    with mock.patch('wagtail.core.models.Page.serve'):
+        post(rf, {'name': 'Alice'})
+    assert metrics.contact_submissions.get(outcome='invalid') == 1
+    assert metrics.contact_stage_seconds.get_count(stage='email_send') == 0
+
+
+@pytest.mark.django_db
+def test_contact_submission_error(rf):
+    with mock.patch('django.core.mail.EmailMessage.send', side_effect=OSError):
+        with pytest.raises(OSError):
+            post(rf, {'name': 'Alice', 'email': 'alice@example.com', 'message': 'Where is Bob?'})
+    assert metrics.contact_submissions.get(outcome='error') == 1
+    assert metrics.contact_stage_failures.get(stage='email_send') == 1
+    assert metrics.contact_stage_failures.get(stage='submission') == 1
+
+
+def test_contact_captcha_stage(settings):
+    settings.RECAPTCHA_PUBLIC_KEY = 'public'
+    settings.RECAPTCHA_PRIVATE_KEY = 'private'
+    from wagtail_extensions.forms import ContactForm
+    form = ContactForm({'name': 'Alice', 'email': 'alice@example.com', 'message': 'Hi', 'captcha': 'token'})
+    with mock.patch('captcha.fields.client.submit') as submit:
+        submit.return_value.is_valid = True
+        submit.return_value.extra_data = {'score': 0.9}
+        assert form.is_valid()
+    assert metrics.contact_stage_seconds.get_count(stage='captcha') == 1
@@ -0,0 +1,151 @@
+from unittest import mock
+
+import pytest
+from django.contrib import messages
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.template import engines
+from django.utils import timezone
+
+from wagtail.core.models import Page
+from wagtail_extensions import holepunch, tracking
+
+from testproject.testapp.models import ContactPage
+
+
+TEMPLATE = (
+    '{% load wagtailextensions_tags %}'
+    '<h1>{{ page.title }}</h1>'
+    '<form method="post">{% csrf_token %}{{ form.name }}</form>'
+    '{% uncached "wagtail_extensions/partials/messages.html" %}'
+)
+
+
+@pytest.fixture
+def contact_page(db):
+    root = Page.objects.get(url_path='/home/')
+    page = root.add_child(instance=ContactPage(title='Contact', slug='contact'))
+    page.save_revision().publish()
+    page.refresh_from_db()
+    with mock.patch.object(ContactPage, 'template', engines['django'].from_string(TEMPLATE)), \
+            mock.patch.object(ContactPage, 'page_cache_timeout', 60):
+        yield page
+
+
+def get(rf, page, method='get', **attrs):
+    request = getattr(rf, method)('/contact/')
+    request.user = AnonymousUser()
+    request._messages = CookieStorage(request)
+    for name, value in attrs.items():
+        setattr(request, name, value)
+    return request, page.serve(request)
+
+
+def test_page_cache(rf, contact_page, django_assert_num_queries):
+    _, response = get(rf, contact_page)
+    assert '<h1>Contact</h1>' in response.content.decode()
+
+    with mock.patch.object(ContactPage, 'get_form') as get_form, django_assert_num_queries(0):
+        request, response = get(rf, contact_page)
+    get_form.assert_not_called()
+
+    content = response.content.decode()
+    assert '<h1>Contact</h1>' in content
+    assert 'name="name"' in content
+    assert holepunch.CSRF_TOKEN_MARKER not in content
+    assert 'name="csrfmiddlewaretoken" value="' in content
+    assert request.META['CSRF_COOKIE_USED']
+
+
+def test_page_cache_messages(rf, contact_page):
+    get(rf, contact_page)
+
+    request = rf.get('/contact/')
+    request.user = AnonymousUser()
+    request._messages = CookieStorage(request)
+    messages.info(request, 'Thank you!')
+    content = contact_page.serve(request).content.decode()
+    assert 'alert-info' in content and 'Thank you!' in content
+
+    _, response = get(rf, contact_page)
+    assert 'Thank you!' not in response.content.decode()
+
+
+def test_page_cache_session_submission(rf, contact_page):
+    template = engines['django'].from_string(TEMPLATE + '{% track_form_submission request %}')
+    submitted = {tracking.KEY: timezone.now().strftime(tracking.TIMESTAMP_FORMAT)}
+    with mock.patch.object(ContactPage, 'template', template):
+        _, response = get(rf, contact_page, session=dict(submitted))
+        assert 'gtag(' in response.content.decode()
+
+        _, response = get(rf, contact_page, session={})
+        content = response.content.decode()
+        assert 'gtag(' not in content
+        assert 'wagtail-extensions-hole' not in content
+
+        request, response = get(rf, contact_page, session=dict(submitted))
+        assert 'gtag(' in response.content.decode()
+        assert tracking.KEY not in request.session
+
+
+def test_page_cache_key_query_params(rf, contact_page):
+    def key(path):
+        return contact_page.get_page_cache_key(rf.get(path))
+
+    assert key('/contact/') == key('/contact/?utm_source=newsletter') == key('/contact/?page=2')
+    with mock.patch.object(ContactPage, 'page_cache_query_params', ('page',)):
+        assert key('/contact/?page=2&utm_source=newsletter') == key('/contact/?page=2')
+        assert key('/contact/?page=2') != key('/contact/?page=3') != key('/contact/')
+
+
+def test_page_cache_new_revision(rf, contact_page):
+    get(rf, contact_page)
+
+    contact_page.title = 'Contact us'
+    contact_page.save_revision().publish()
+    contact_page.refresh_from_db()
+
+    _, response = get(rf, contact_page)
+    assert '<h1>Contact us</h1>' in response.content.decode()
+
+
+@pytest.mark.parametrize('method, attrs', [
+    ('post', {}),
+    ('get', {'is_preview': True}),
+    ('get', {'user': mock.Mock(is_authenticated=True)}),
+])
+def test_page_cache_bypassed(rf, contact_page, method, attrs):
+    request = rf.get('/contact/')
+    request.user = AnonymousUser()
+    assert contact_page.is_page_cacheable(request)
+
+    with mock.patch('wagtail_extensions.mixins.cache') as page_cache, \
+            mock.patch('wagtail_extensions.mixins.ContactMixin.handle_submission', return_value=None):
+        _, response = get(rf, contact_page, method, **attrs)
+    page_cache.get.assert_not_called()
+    assert holepunch.CSRF_TOKEN_MARKER not in response.rendered_content
+
+
+def test_page_cache_disabled(rf, contact_page):
+    with mock.patch.object(ContactPage, 'page_cache_timeout', 0):
+        request = rf.get('/contact/')
+        request.user = AnonymousUser()
+        assert not contact_page.is_page_cacheable(request)
+
+
+def test_uncached_renders_in_place(rf):
+    template = engines['django'].from_string(
+        '{% load wagtailextensions_tags %}{% uncached "wagtail_extensions/partials/messages.html" %}')
+    request = rf.get('/')
+    request._messages = CookieStorage(request)
+    messages.info(request, 'Hello')
+    assert 'Hello' in template.render({'messages': messages.get_messages(request), 'request': request})
+
+    with holepunch.punching_holes(request):
+        assert template.render({'request': request}) == \
+            '<!--wagtail-extensions-hole:wagtail_extensions/partials/messages.html-->'
+
+
+def test_template_marker_validates_name():
+    with pytest.raises(ValueError):
+        holepunch.get_template_marker('--><script>')
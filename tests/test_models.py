@@ -1,16 +1,18 @@
 import datetime
 import pytest
+import re
 from unittest import mock
 
 from django.core.cache import cache
 from freezegun import freeze_time
 
 from wagtail.core.models import Site
+from wagtail_extensions.phone import parse_phone_number
 from wagtail_extensions.forms import ContactForm
 from wagtail_extensions.mixins import ContactMixin
-from wagtail_extensions.models import ContactSubmission
+from wagtail_extensions.models import ContactSubmission, Location
 
-from testproject.testapp.models import ContactDetailsTestSetting, ContactPage
+from testproject.testapp.models import ContactDetailsTestSetting, ContactPage, SocialMediaTestSetting
 
 
 @pytest.mark.django_db
@@ -221,3 +223,196 @@ def test_submission_saves_tracker_to_session(rf):
     page = ContactPage()
     page.serve(request)
     assert 'enquiry_form_submitted' in request.session
+
+
+@pytest.mark.django_db
+def test_contact_details_nearest_locations(contact_setting):
+    contact_setting.locations = [
+        ('location', {'name': 'Nairobi', 'point': 'SRID=4326;POINT(36.8219 -1.2921)'}),
+        ('location', {'name': 'No point'}),
+        ('location', {'name': 'London', 'point': 'SRID=4326;POINT(-0.1278 51.5074)'}),
+    ]
+    contact_setting.save()
+
+    out = contact_setting.nearest_locations(48.8566, 2.3522, k=2)
+    assert [location.value['name'] for _, location in out] == ['London', 'Nairobi']
+    assert out[0][0] == pytest.approx(343.5, abs=1)
+
+    out = contact_setting.locations_within(48.8566, 2.3522, 500)
+    assert [location.value['name'] for _, location in out] == ['London']
+
+
+@pytest.mark.django_db
+def test_contact_details_location_index_cached_on_save(contact_setting):
+    contact_setting.locations = [
+        ('location', {'name': 'Nairobi', 'point': 'SRID=4326;POINT(36.8219 -1.2921)'}),
+    ]
+    contact_setting.save()
+
+    setting = ContactDetailsTestSetting.objects.get(pk=contact_setting.pk)
+    with mock.patch.object(ContactDetailsTestSetting, 'build_location_index') as mocked_build:
+        assert len(setting.location_index) == 1
+    mocked_build.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_contact_details_location_index_changed_without_save(contact_setting):
+    contact_setting.locations = [
+        ('location', {'name': 'Nairobi', 'point': 'SRID=4326;POINT(36.8219 -1.2921)'}),
+    ]
+    contact_setting.save()
+    london = ContactDetailsTestSetting(locations=[
+        ('location', {'name': 'No point'}),
+        ('location', {'name': 'London', 'point': 'SRID=4326;POINT(-0.1278 51.5074)'}),
+    ])
+    ContactDetailsTestSetting.objects.filter(pk=contact_setting.pk).update(locations=london.locations)
+
+    setting = ContactDetailsTestSetting.objects.get(pk=contact_setting.pk)
+    out = setting.nearest_locations(48.8566, 2.3522)
+    assert [location.value['name'] for _, location in out] == ['London']
+
+
+@pytest.mark.django_db
+def test_contact_details_sync_location_tables(contact_setting):
+    contact_setting.locations = [
+        ('location', {
+            'name': 'Nairobi',
+            'primary': True,
+            'address': {'lines': ['1 Road', '', 'Nairobi']},
+            'point': 'SRID=4326;POINT(36.8219 -1.2921)',
+            'departments': [
+                {'name': 'Sales', 'email': 'sales@example.com', 'phones': ['+447528712345']},
+            ],
+            'opening_times': {'times': [
+                {'weekday': '6', 'closed': True},
+                {'weekday': '0', 'start': '09:00', 'end': '17:00'},
+            ]},
+        }),
+        ('location', {'name': 'London'}),
+    ]
+    with mock.patch.object(ContactDetailsTestSetting, 'sync_locations', True):
+        contact_setting.save()
+        # Syncing again replaces, rather than duplicates, the rows
+        contact_setting.save()
+
+    assert list(Location.objects.values_list('name', flat=True)) == ['Nairobi', 'London']
+    nairobi = Location.objects.get(name='Nairobi')
+    assert nairobi.address == '1 Road\nNairobi'
+    assert nairobi.lat == pytest.approx(-1.2921)
+    assert nairobi.primary
+    assert Location.objects.filter(departments__email='sales@example.com').get() == nairobi
+    assert Location.objects.filter(departments__phones__number='+447528712345').get() == nairobi
+    assert not Location.objects.filter(opening_times__weekday=6, opening_times__closed=False).exists()
+    assert nairobi.opening_times.get(weekday=0).start == datetime.time(9)
+
+
+@pytest.mark.django_db
+def test_contact_details_sync_location_tables_bulk(contact_setting, location_data, django_assert_max_num_queries):
+    contact_setting.locations = [
+        ('location', dict(location_data, name='Location {}'.format(i), primary=i == 0)) for i in range(20)
+    ]
+    contact_setting.sync_locations = True
+    contact_setting.save()
+    # Not a query per location, department or phone
+    with django_assert_max_num_queries(20):
+        contact_setting.sync_location_tables()
+
+    assert Location.objects.count() == 20
+    location = Location.objects.get(name='Location 3')
+    assert location.departments.get().phones.get().number == '+447528712345'
+    assert location.opening_times.get().weekday == 1
+
+
+@pytest.mark.django_db
+def test_contact_details_delete_removes_location_tables(contact_setting, location_data):
+    contact_setting.locations = [('location', location_data)]
+    with mock.patch.object(ContactDetailsTestSetting, 'sync_locations', True):
+        contact_setting.save()
+    assert Location.objects.exists()
+
+    contact_setting.delete()
+    assert not Location.objects.exists()
+
+
+@pytest.mark.django_db
+def test_contact_details_sync_locations_disabled(contact_setting):
+    contact_setting.locations = [('location', {'name': 'Nairobi'})]
+    contact_setting.save()
+    assert not Location.objects.exists()
+
+
+@pytest.mark.django_db
+def test_contact_details_primary_phone_only_parses_primary_department(contact_setting):
+    contact_setting.locations = [
+        ('location', {
+            'primary': False,
+            'departments': [{'phones': ['+447528712340']}],
+        }),
+        ('location', {
+            'primary': True,
+            'departments': [
+                {'primary': False, 'phones': ['+447528712341']},
+                {'primary': True, 'phones': ['+447528712345', '+447528712346']},
+            ],
+        }),
+    ]
+    contact_setting.save()
+    setting = ContactDetailsTestSetting.objects.get(pk=contact_setting.pk)
+
+    with mock.patch('wagtail_extensions.phone.parse_phone_number', wraps=parse_phone_number) as mocked_parse:
+        assert setting.primary_phone == '+447528712345'
+
+    assert mocked_parse.call_count == 2
+
+
+@pytest.fixture
+def social_setting(db):
+    setting = SocialMediaTestSetting(site=Site.objects.get(is_default_site=True))
+    setting.profiles = [
+        ('profile', {'icon': 'twitter', 'url': 'https://twitter.com/example'}),
+        ('profile', {'icon': 'mastodon', 'url': 'https://example.social/@example'}),
+    ]
+    setting.save()
+    return setting
+
+
+def test_social_media_profiles_html(social_setting):
+    html = social_setting.profiles_html
+    assert '<a href="https://twitter.com/example" target="_blank" rel="noopener" aria-label="Twitter">' in html
+    assert '<span class="fa fa-twitter"></span>' in html
+    assert '<svg' not in html
+
+
+def test_social_media_profiles_html_svg(social_setting, settings):
+    settings.WAGTAIL_EXTENSIONS_SOCIAL_MEDIA_ICONS = 'svg'
+    html = social_setting.profiles_html
+    assert 'fa fa-' not in html
+    assert html.count('<symbol') == 1
+    assert '<symbol id="social-icon-twitter"' in html
+    assert '<use href="#social-icon-twitter"></use>' in html
+    # No icon for it, so its name is shown
+    assert 'aria-label="mastodon">mastodon</a>' in html
+
+
+def test_social_media_icon_symbol():
+    assert SocialMediaTestSetting.get_icon_symbol('twitter').startswith('<symbol id="social-icon-twitter"')
+    assert SocialMediaTestSetting.get_icon_symbol('../twitter') is None
+    with mock.patch.object(SocialMediaTestSetting, 'ICON_NAME_RE', re.compile(r'^$')):
+        assert SocialMediaTestSetting.get_icon_symbol('twitter') is None
+
+
+def test_social_media_profiles_html_regenerated_on_save(social_setting, django_assert_num_queries):
+    social_setting.profiles = [('profile', {'icon': 'facebook', 'url': 'https://facebook.com/example'})]
+    social_setting.save()
+
+    site = Site.objects.get(is_default_site=True)
+    with django_assert_num_queries(0):
+        html = SocialMediaTestSetting.get_profiles_html_for_site(site)
+    assert 'https://facebook.com/example' in html
+    assert 'twitter' not in html
+
+
+def test_social_media_profiles_html_for_site_not_cached(social_setting):
+    cache.clear()
+    html = SocialMediaTestSetting.get_profiles_html_for_site(Site.objects.get(is_default_site=True))
+    assert 'https://twitter.com/example' in html
@@ -0,0 +1,42 @@
+from unittest.mock import Mock, patch
+
+from wagtail.core.fields import StreamField
+from wagtail_extensions.renditions import (
+    generate_rendition, get_page_rendition_specs, prewarm_page_renditions)
+
+
+def test_get_page_rendition_specs():
+    child = Mock()
+    child.block.get_rendition_specs.return_value = [('image', 'fill-10x10')]
+    plain_child = Mock(spec=['block', 'value'])
+    plain_child.block = Mock(spec=[])
+    field = Mock(spec=StreamField)
+    field.name = 'body'
+
+    page = Mock()
+    page.specific = page
+    page._meta.get_fields.return_value = [Mock(), field]
+    page.body = [child, plain_child]
+    specs = list(get_page_rendition_specs(page))
+
+    assert specs == [('image', 'fill-10x10')]
+    child.block.get_rendition_specs.assert_called_once_with(child.value)
+
+
+def test_prewarm_page_renditions_deduplicates():
+    executor = Mock()
+    page = Mock()
+    specs = [('image', 'fill-10x10'), ('image', 'fill-10x10'), ('image', 'fill-20x20')]
+    with patch('wagtail_extensions.renditions.get_page_rendition_specs', return_value=specs):
+        futures = prewarm_page_renditions(page, executor=executor)
+
+    assert len(futures) == 2
+    assert executor.submit.call_count == 2
+
+
+def test_generate_rendition_swallows_errors():
+    image = Mock()
+    image.get_rendition.side_effect = IOError
+    # Should log rather than raise inside the worker
+    generate_rendition(image, 'fill-10x10')
+    image.get_rendition.assert_called_once_with('fill-10x10')
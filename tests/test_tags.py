@@ -1,12 +1,17 @@
+import datetime
 import pytest
 from datetime import timedelta
+from unittest import mock
 from django import VERSION as DJANGO_VERSION
+from django.core.exceptions import ImproperlyConfigured
 from django.template import engines
+from django.template.loader import get_template
 from django.utils import timezone
+from freezegun import freeze_time
 
-from wagtail.core.models import Page
+from wagtail.core.models import Page, PageViewRestriction, Site
 from wagtail_extensions.templatetags.wagtailextensions_tags import (
-    page_menu_children, track_form_submission, menu)
+    breadcrumbs, map, page_menu_children, track_form_submission, menu)
 
 
 @pytest.mark.django_db
@@ -88,6 +93,26 @@ def test_track_form_invalid_session_data(rf):
     assert ctx == {'enquiry_form_submitted': False}
 
 
+@pytest.mark.parametrize('mode', ['cookie', 'query'])
+def test_track_form_submission_client_side(rf, settings, mode):
+    settings.WAGTAIL_EXTENSIONS_FORM_SUBMISSION_TRACKING = mode
+    # No session: the page mustn't depend on it
+    request = rf.get('/')
+
+    ctx = track_form_submission(request)
+
+    assert ctx == {'mode': mode, 'key': 'enquiry_form_submitted'}
+    output = get_template('wagtail_extensions/partials/track_form_submission.html').render(ctx)
+    assert "gtag('event', 'submitted'" in output
+    assert ('document.cookie' in output) == (mode == 'cookie')
+
+
+def test_track_form_submission_invalid_mode(rf, settings):
+    settings.WAGTAIL_EXTENSIONS_FORM_SUBMISSION_TRACKING = 'cache'
+    with pytest.raises(ImproperlyConfigured):
+        track_form_submission(rf.get('/'))
+
+
 @pytest.mark.django_db
 def test_page_menu_children(page_tree):
     root, pages = page_tree
@@ -108,6 +133,13 @@ def test_page_menu_children(page_tree):
     assert out[1].active == False
 
 
+@pytest.mark.django_db
+def test_page_menu_children_restricted(page_tree):
+    root, pages = page_tree
+    PageViewRestriction.objects.create(page=pages[1], restriction_type=PageViewRestriction.PASSWORD, password='x')
+    assert [page.slug for page in page_menu_children(root)] == ['test_1', 'test_2']
+
+
 @pytest.mark.django_db
 def test_menu_tag(page_tree, rf):
     root, pages = page_tree
@@ -120,6 +152,41 @@ def test_menu_tag(page_tree, rf):
     assert out['menuitems'][1].slug == 'test_2'
     assert len(out['menuitems'][0].children) == 1
     assert out['menuitems'][0].children[0].slug == 'child_1'
+    assert out['menuitems'][0].children[0].children_url is None
+
+
+@pytest.mark.django_db
+def test_menu_tag_children_url(page_tree, rf):
+    root, pages = page_tree
+    pages[4].add_child(instance=Page(title='A grandchild', slug='grandchild_1', show_in_menus=True, live=True))
+    out = menu({'request': rf.get('/')}, root)
+    child = out['menuitems'][0].children[0]
+    assert child.children_url.startswith('/wagtail-extensions/menu/{}/?v='.format(child.pk))
+
+
+@pytest.mark.django_db
+def test_social_profiles(rf):
+    from testproject.testapp.models import SocialMediaTestSetting
+    setting = SocialMediaTestSetting(site=Site.objects.get(is_default_site=True))
+    setting.profiles = [('profile', {'icon': 'twitter', 'url': 'https://twitter.com/example'})]
+    setting.save()
+
+    template = engines['django'].from_string(
+        '{% load wagtailextensions_tags %}{% social_profiles "testapp.SocialMediaTestSetting" %}')
+    output = template.render({'request': rf.get('/')})
+    assert '<span class="fa fa-twitter"></span>' in output
+    assert '&lt;' not in output
+
+
+def test_social_profiles_no_site(rf, db):
+    template = engines['django'].from_string(
+        '{% load wagtailextensions_tags %}{% social_profiles "testapp.SocialMediaTestSetting" %}')
+    with mock.patch.object(Site, 'find_for_request', return_value=None):
+        assert template.render({'request': rf.get('/')}) == ''
+
+
+def test_menu_assets(render_template):
+    assert 'wagtail_extensions/js/menu.js' in render_template('{% menu_assets %}')
 
 
 def test_metablock_with_no_modifications(render_template):
@@ -142,3 +209,81 @@ def test_metablock_with_modifications(render_template):
         expected_output = 'The world&#x27;s &quot;fastest&quot; supercomputers, period &lt;-&gt; Jane &amp; John Doe.'
     output = render_template(template_string)
     assert output == expected_output
+
+
+def test_map_assets_defers_maps_api(render_template):
+    output = render_template('{% map_assets %}')
+    assert 'defer' in output
+    assert 'data-api-key=' in output
+    # The Maps API itself is only requested by maps.js once a map is visible
+    assert 'maps.googleapis.com' not in output
+
+
+def test_map_interactive():
+    ctx = map({'lat': -1.3, 'lng': 36.8}, zoom=10)
+    assert ctx['static_map_url'] is None
+
+
+def test_map_static(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    ctx = map({'lat': -1.3, 'lng': 36.8}, zoom=10, static=True)
+    assert ctx['static_map_url'].endswith('.png')
+
+
+@freeze_time('2017-12-22')
+def test_opening_schedule():
+    value = {'times': [{'weekday': 4, 'start': datetime.time(9), 'end': datetime.time(17)}]}
+    output = engines['django'].from_string(
+        '{% load wagtailextensions_tags %}{% opening_schedule value days=8 %}'
+    ).render({'value': value})
+    assert output.count('opening-time-open') == 2
+    assert '22 Dec 2017' in output
+    assert '29 Dec 2017' in output
+
+
+@pytest.mark.django_db
+def test_breadcrumbs(page_tree, rf, django_assert_num_queries):
+    root, pages = page_tree
+    grandchild = pages[4].add_child(instance=Page(title='Grandchild', slug='grandchild'))
+    request = rf.get('/')
+    # Serving a page finds the site and its root paths, and keeps them on the request
+    root.get_url(request)
+    with django_assert_num_queries(1):
+        ctx = breadcrumbs({'request': request}, grandchild)
+    assert [(ancestor.title, url) for ancestor, url in ctx['crumbs']] == [
+        ('Welcome to your new Wagtail site!', '/'),
+        ('A test page 1', '/test_1/'),
+        ('A test child of page 1', '/test_1/child_1/'),
+    ]
+    assert ctx['page'] == grandchild
+
+
+@pytest.mark.django_db
+def test_breadcrumbs_site_root(page_tree, rf):
+    root, pages = page_tree
+    assert breadcrumbs({'request': rf.get('/')}, root)['crumbs'] == []
+
+
+@pytest.mark.django_db
+def test_breadcrumbs_reuse_menu_pages(page_tree, rf, django_assert_num_queries):
+    root, pages = page_tree
+    request = rf.get('/')
+    root.get_url(request)
+    menu({'request': request}, root, pages[4])
+    with django_assert_num_queries(0):
+        ctx = breadcrumbs({'request': request}, pages[4])
+    assert [ancestor.title for ancestor, _ in ctx['crumbs']] == ['Welcome to your new Wagtail site!', 'A test page 1']
+
+
+@pytest.mark.django_db
+def test_breadcrumbs_render(page_tree, rf):
+    root, pages = page_tree
+    output = engines['django'].from_string(
+        '{% load wagtailextensions_tags %}{% breadcrumbs %}'
+    ).render({'page': pages[4], 'request': rf.get('/')})
+    assert '<a href="/test_1/">A test page 1</a>' in output
+    assert 'aria-current="page">A test child of page 1</li>' in output
+
+
+def test_breadcrumbs_no_page():
+    assert breadcrumbs({}) == {'crumbs': []}
@@ -0,0 +1,36 @@
+from unittest import mock
+
+import pytest
+
+from wagtail_extensions.tracking import add_query_param
+
+from testproject.testapp.models import ContactPage
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('/contact/', '/contact/?enquiry_form_submitted=1'),
+    ('/contact/?ref=ad#form', '/contact/?ref=ad&enquiry_form_submitted=1#form'),
+    ('https://example.com/?enquiry_form_submitted=0', 'https://example.com/?enquiry_form_submitted=1'),
+])
+def test_add_query_param(url, expected):
+    assert add_query_param(url, 'enquiry_form_submitted', '1') == expected
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('mode', ['session', 'cookie', 'query'])
+def test_contact_submission_tracking(rf, settings, mode):
+    settings.WAGTAIL_EXTENSIONS_FORM_SUBMISSION_TRACKING = mode
+    request = rf.post('/', {'name': 'Alice', 'email': 'alice@example.com', 'message': 'Where is Bob?'})
+    request._messages = mock.MagicMock()
+    request.session = {}
+    page = ContactPage()
+    page.success_url = '/contact/?ref=ad'
+
+    response = page.serve(request)
+
+    assert ('enquiry_form_submitted' in request.session) == (mode == 'session')
+    assert ('enquiry_form_submitted' in response.cookies) == (mode == 'cookie')
+    if mode == 'query':
+        assert response['Location'] == '/contact/?ref=ad&enquiry_form_submitted=1'
+    else:
+        assert response['Location'] == '/contact/?ref=ad'
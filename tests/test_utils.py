@@ -44,3 +44,70 @@ def test_nth_default():
 def test_nth_works():
     out = nth([1, 2, 3, 4, 5], 2)
     assert out == 3
+
+
+def test_true_or_nth_match():
+    match = {'match': True}
+    items = [{}, match]
+    item = true_or_nth(items, predicate=lambda x: x.get('match') == True)
+    assert item == match
+
+
+def test_true_or_nth_empty():
+    assert true_or_nth([], default='fish') == 'fish'
+
+
+def test_true_or_nth_nth():
+    assert true_or_nth([1, 2, 3], predicate=lambda x: x > 5, n=1) == 2
+
+
+def test_true_or_nth_nth_out_of_range():
+    assert true_or_nth([1, 2, 3], predicate=lambda x: x > 5, n=5, default='fish') == 'fish'
+
+
+def test_true_or_nth_no_predicate():
+    assert true_or_nth([0, '', 3]) == 3
+
+
+def test_true_or_nth_generator_match_first():
+    # The first item must reach the predicate rather than being used up
+    # looking for the nth item.
+    items = ({'match': i == 0} for i in range(3))
+    item = true_or_nth(items, predicate=lambda x: x['match'])
+    assert item == {'match': True}
+
+
+class CountingIterable:
+
+    def __init__(self, items):
+        self.items = items
+        self.iterations = 0
+        self.consumed = 0
+
+    def __iter__(self):
+        self.iterations += 1
+        for item in self.items:
+            self.consumed += 1
+            yield item
+
+
+def test_true_or_nth_large_input_single_pass():
+    items = CountingIterable(range(100000))
+    item = true_or_nth(items, predicate=lambda x: x == 99999, n=10)
+    assert item == 99999
+    assert items.iterations == 1
+    assert items.consumed == 100000
+
+
+def test_true_or_nth_large_input_stops_at_match():
+    items = CountingIterable(range(100000))
+    item = true_or_nth(items, predicate=lambda x: x == 500, n=10)
+    assert item == 500
+    assert items.consumed == 501
+
+
+def test_true_or_nth_large_input_nomatch():
+    items = CountingIterable(range(100000))
+    item = true_or_nth(items, predicate=lambda x: x < 0, n=50000)
+    assert item == 50000
+    assert items.iterations == 1
@@ -0,0 +1,178 @@
+import json
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.http import Http404
+from django.urls import resolve, reverse
+from freezegun import freeze_time
+
+from wagtail.core.models import Page, PageViewRestriction, Site
+from wagtail_extensions import menus
+from wagtail_extensions.views import ContactDetailsView, MetricsView
+
+from testproject.testapp.models import ContactDetailsTestSetting
+
+
+@pytest.fixture
+def contact_setting(db, location_data):
+    setting = ContactDetailsTestSetting(site=Site.objects.get(is_default_site=True))
+    setting.locations = [('location', location_data)]
+    setting.save()
+    return setting
+
+
+@pytest.fixture
+def view():
+    return ContactDetailsView.as_view(setting_model=ContactDetailsTestSetting)
+
+
+@freeze_time('2017-06-06')
+def test_contact_details_view(rf, view, contact_setting):
+    response = view(rf.get('/'))
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/json'
+    assert 'public' in response['Cache-Control']
+    assert response['ETag'].startswith('"')
+
+    data = json.loads(response.content)
+    location = data['locations'][0]
+    assert location['name'] == 'Nairobi'
+    assert location['departments'][0]['phones'] == ['+447528712345']
+    assert data['primary_opening_today']['start'] == '09:00:00'
+
+
+def test_contact_details_view_not_modified(rf, view, contact_setting, django_assert_num_queries):
+    etag = view(rf.get('/'))['ETag']
+
+    with django_assert_num_queries(0):
+        response = view(rf.get('/', HTTP_IF_NONE_MATCH=etag))
+
+    assert response.status_code == 304
+    assert response['ETag'] == etag
+
+
+def test_contact_details_view_etag_changes_on_save(rf, view, contact_setting):
+    etag = view(rf.get('/'))['ETag']
+
+    contact_setting.locations = [('location', {'name': 'London'})]
+    contact_setting.save()
+    response = view(rf.get('/', HTTP_IF_NONE_MATCH=etag))
+
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+    assert json.loads(response.content)['locations'][0]['name'] == 'London'
+
+
+def test_contact_details_view_requires_setting_model(rf):
+    with pytest.raises(ImproperlyConfigured):
+        ContactDetailsView.as_view()(rf.get('/'))
+
+
+def test_metrics_view(rf, settings):
+    settings.WAGTAIL_EXTENSIONS_METRICS_ALLOWED_IPS = ['127.0.0.1']
+    from wagtail_extensions import metrics
+    metrics.contact_submissions.inc(outcome='sent')
+    url = reverse('wagtail_extensions:metrics')
+    response = resolve(url).func(rf.get(url, REMOTE_ADDR='127.0.0.1'))
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    assert 'no-cache' in response['Cache-Control']
+    assert 'wagtail_extensions_contact_submissions_total{outcome="sent"}' in response.content.decode()
+    metrics.registry.clear()
+
+
+def test_metrics_view_disabled(rf):
+    response = MetricsView.as_view()(rf.get('/', REMOTE_ADDR='127.0.0.1'))
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize('meta', [
+    {'REMOTE_ADDR': '203.0.113.1'},
+    {'REMOTE_ADDR': '127.0.0.1', 'HTTP_X_FORWARDED_FOR': '203.0.113.1'},
+])
+def test_metrics_view_local_only(rf, settings, meta):
+    settings.WAGTAIL_EXTENSIONS_METRICS_ALLOWED_IPS = ['127.0.0.1']
+    response = MetricsView.as_view()(rf.get('/', **meta))
+    assert response.status_code == 403
+
+
+def test_metrics_view_allowed_ips(rf, settings):
+    settings.WAGTAIL_EXTENSIONS_METRICS_ALLOWED_IPS = ['203.0.113.1']
+    response = MetricsView.as_view()(rf.get('/', REMOTE_ADDR='203.0.113.1'))
+    assert response.status_code == 200
+
+
+@pytest.fixture
+def menu_tree(db):
+    root = Page.objects.get(url_path='/home/')
+    section = root.add_child(instance=Page(title='Section', slug='section', show_in_menus=True, live=True))
+    child = section.add_child(instance=Page(title='Child', slug='child', show_in_menus=True, live=True))
+    child.add_child(instance=Page(title='Grandchild', slug='grandchild', show_in_menus=True, live=True))
+    section.add_child(instance=Page(title='Hidden', slug='hidden', show_in_menus=False, live=True))
+    return section, child
+
+
+def get_menu_children(rf, page, **extra):
+    url = reverse('wagtail_extensions:menu_children', args=[page.pk])
+    return resolve(url).func(rf.get(url, **extra), page_id=page.pk)
+
+
+def test_menu_children_view(rf, menu_tree):
+    section, child = menu_tree
+    response = get_menu_children(rf, section)
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/json'
+    assert 'public' in response['Cache-Control']
+
+    items = json.loads(response.content)['items']
+    assert [item['title'] for item in items] == ['Child']
+    assert items[0]['id'] == child.pk
+    assert items[0]['url'] == '/section/child/'
+    assert items[0]['children_url'].startswith(reverse('wagtail_extensions:menu_children', args=[child.pk]) + '?v=')
+
+    grandchildren = json.loads(get_menu_children(rf, child).content)['items']
+    assert grandchildren[0]['title'] == 'Grandchild'
+    assert grandchildren[0]['children_url'] is None
+
+
+def test_menu_children_view_not_modified(rf, menu_tree, django_assert_num_queries):
+    section, _ = menu_tree
+    etag = get_menu_children(rf, section)['ETag']
+
+    with django_assert_num_queries(0):
+        response = get_menu_children(rf, section, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 304
+
+
+def test_menu_children_view_not_live(rf, menu_tree):
+    section, _ = menu_tree
+    section.unpublish()
+    with pytest.raises(Http404):
+        get_menu_children(rf, section)
+
+
+def test_menu_children_view_not_in_menu(rf, menu_tree):
+    with pytest.raises(Http404):
+        get_menu_children(rf, Page.objects.get(slug='hidden'))
+
+
+def test_menu_children_view_restricted(rf, menu_tree):
+    section, child = menu_tree
+    PageViewRestriction.objects.create(page=child, restriction_type=PageViewRestriction.PASSWORD, password='x')
+    assert json.loads(get_menu_children(rf, section).content)['items'] == []
+    with pytest.raises(Http404):
+        get_menu_children(rf, child)
+
+
+def test_menu_children_view_tree_version(rf, menu_tree):
+    section, _ = menu_tree
+    etag = get_menu_children(rf, section)['ETag']
+
+    Page.objects.filter(slug='hidden').update(show_in_menus=True)
+    assert get_menu_children(rf, section)['ETag'] == etag
+
+    menus.bump_tree_version()
+    response = get_menu_children(rf, section)
+    assert response['ETag'] != etag
+    assert len(json.loads(response.content)['items']) == 2
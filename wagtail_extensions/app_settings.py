@@ -1,12 +1,79 @@
+"""
+Settings for wagtail_extensions, read from Django settings when first used
+rather than at import, e.g. ``app_settings.GEO_WIDGET_ZOOM``.
+
+Values are remembered until Django sends setting_changed (override_settings,
+the pytest-django settings fixture), which forgets the changed one.
+"""
 from django.conf import settings
+from django.core.signals import setting_changed
+
+
+# Attribute name: (Django setting name, default)
+DEFAULTS = {
+    'GEO_WIDGET_DEFAULT_LOCATION': ('GEO_WIDGET_DEFAULT_LOCATION', {'lat': -1.3, 'lng': 36.8}),
+    # Shared with wagtailgeowidget, so uses its default
+    'GEO_WIDGET_ZOOM': ('GEO_WIDGET_ZOOM', 7),
+    'GOOGLE_MAPS_V3_APIKEY': ('GOOGLE_MAPS_V3_APIKEY', None),
+
+    'SOCIAL_MEDIA_TYPES': ('SOCIAL_MEDIA_TYPES', (
+        ('facebook', 'Facebook'),
+        ('twitter', 'Twitter'),
+        ('instagram', 'Instagram'),
+        ('linkedin', 'LinkedIn'),
+    )),
+    # Icons in social_profiles: font (Font Awesome classes) or svg (an inline sprite)
+    'SOCIAL_MEDIA_ICONS': ('WAGTAIL_EXTENSIONS_SOCIAL_MEDIA_ICONS', 'font'),
+
+    # Number of background threads used to generate block image renditions when a
+    # page is published. Set to 0 to disable pre-warming.
+    'RENDITION_PREWARM_WORKERS': ('WAGTAIL_EXTENSIONS_RENDITION_PREWARM_WORKERS', 2),
+
+    # Renders the images used by the map tag in static mode
+    'STATIC_MAP_RENDERER': (
+        'WAGTAIL_EXTENSIONS_STATIC_MAP_RENDERER', 'wagtail_extensions.maps.GoogleStaticMapRenderer'),
+    'STATIC_MAP_SIZE': ('WAGTAIL_EXTENSIONS_STATIC_MAP_SIZE', (640, 320)),
+
+    # Number of parsed phone numbers PhoneBlock keeps in memory; read once,
+    # when wagtail_extensions.phone is imported
+    'PHONE_NUMBER_CACHE_SIZE': ('WAGTAIL_EXTENSIONS_PHONE_NUMBER_CACHE_SIZE', 1024),
+
+    # Public holidays for OpeningTimeBlock.PUBLIC opening times; no region means none are applied
+    'HOLIDAY_CALENDAR': ('WAGTAIL_EXTENSIONS_HOLIDAY_CALENDAR', 'wagtail_extensions.holidays.StaticHolidayCalendar'),
+    'HOLIDAY_FILE': ('WAGTAIL_EXTENSIONS_HOLIDAY_FILE', None),
+    'HOLIDAY_REGION': ('WAGTAIL_EXTENSIONS_HOLIDAY_REGION', None),
+
+    # Time template tags and block renders (see wagtail_extensions.instrumentation)
+    'INSTRUMENTATION': ('WAGTAIL_EXTENSIONS_INSTRUMENTATION', False),
+    'INSTRUMENTATION_SINK': (
+        'WAGTAIL_EXTENSIONS_INSTRUMENTATION_SINK', 'wagtail_extensions.instrumentation.log_timing'),
+
+    # How contact form submissions are marked for track_form_submission: session, cookie or query
+    'FORM_SUBMISSION_TRACKING': ('WAGTAIL_EXTENSIONS_FORM_SUBMISSION_TRACKING', 'session'),
+
+    # Addresses allowed to read the metrics view; none by default
+    'METRICS_ALLOWED_IPS': ('WAGTAIL_EXTENSIONS_METRICS_ALLOWED_IPS', ()),
+}
+
+
+def __getattr__(name):
+    # Only called for names not yet read; the value is then stored as a
+    # module global, so later reads are plain attribute lookups.
+    try:
+        setting_name, default = DEFAULTS[name]
+    except KeyError:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = globals()[name] = getattr(settings, setting_name, default)
+    return value
+
 
+def reload(setting=None, **kwargs):
+    """
+    Forgets the values read from the given Django setting, or all of them.
+    """
+    for name, (setting_name, _) in DEFAULTS.items():
+        if setting is None or setting == setting_name:
+            globals().pop(name, None)
 
-GEO_WIDGET_DEFAULT_LOCATION = getattr(settings, 'GEO_WIDGET_DEFAULT_LOCATION', {'lat': -1.3, 'lng': 36.8})
-GEO_WIDGET_ZOOM = getattr(settings, 'GEO_WIDGET_ZOOM', 10)
 
-SOCIAL_MEDIA_TYPES = getattr(settings, 'SOCIAL_MEDIA_TYPES', (
-    ('facebook', 'Facebook'),
-    ('twitter', 'Twitter'),
-    ('instagram', 'Instagram'),
-    ('linkedin', 'LinkedIn'),
-))
+setting_changed.connect(reload, dispatch_uid='wagtail_extensions.app_settings.reload')
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class WagtailExtensionsConfig(AppConfig):
+    name = 'wagtail_extensions'
+    verbose_name = 'Wagtail extensions'
+    default_auto_field = 'django.db.models.AutoField'
+
+    def ready(self):
+        from .signal_handlers import register_signal_handlers
+        register_signal_handlers()
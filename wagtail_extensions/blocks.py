@@ -1,28 +1,49 @@
 import calendar
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from collections.abc import ItemsView, Iterable, Mapping, ValuesView
+from contextvars import ContextVar
 import datetime
 from functools import partial
+import hashlib
+from importlib import import_module
 from itertools import groupby
+import json
 import math
+import re
 import uuid
 
-from dateutil.relativedelta import relativedelta
+from django.conf import settings
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.forms.utils import ErrorList
 from django.utils.functional import cached_property
-from django.utils.timezone import now
-from phonenumber_field import phonenumber
-from phonenumber_field.formfields import PhoneNumberField
 from wagtail.core import blocks
 from wagtail.documents.blocks import DocumentChooserBlock
 from wagtail.images.blocks import ImageChooserBlock
-from wagtailgeowidget.blocks import GeoBlock
 
 from . import app_settings
+from . import clock
+from . import holidays
+from . import instrumentation
 from . import utils
 
 
+# The format GeoBlock stores points in, e.g. "SRID=4326;POINT(-0.1 51.5)"
+GEOS_POINT_PATTERN = re.compile(r'^SRID=([0-9]+);POINT\s?\((-?[0-9.]+)\s(-?[0-9.]+)\)$')
+
+# Names that used to be imported into this module, now loaded on first use
+LAZY_IMPORTS = {
+    'GeoBlock': 'wagtailgeowidget.blocks',
+}
+
+
+def __getattr__(name):
+    if name in LAZY_IMPORTS:
+        return getattr(import_module(LAZY_IMPORTS[name]), name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
 class StrippedListBlock(blocks.ListBlock):
     """
     Does not save empty values
@@ -34,6 +55,193 @@ class StrippedListBlock(blocks.ListBlock):
         ]
 
 
+class _Unconverted:
+    """
+    Holds a child's stored value until LazyStructValue converts it.
+    """
+    __slots__ = ('raw',)
+
+    def __init__(self, raw):
+        self.raw = raw
+
+
+class LazyStructValue(blocks.StructValue):
+    """
+    A StructValue that calls to_python on each child the first time it is read.
+    """
+
+    def __getitem__(self, name):
+        value = super().__getitem__(name)
+        if type(value) is _Unconverted:
+            value = self.block.child_blocks[name].to_python(value.raw)
+            super().__setitem__(name, value)
+        return value
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def items(self):
+        return ItemsView(self)
+
+    def values(self):
+        return ValuesView(self)
+
+    def __eq__(self, other):
+        # Compare converted values, not placeholders
+        return dict(self.items()) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, list(self.items()))
+
+    def get_raw(self, name):
+        """
+        Returns the stored value of a child that has not been converted yet,
+        or raises KeyError.
+        """
+        value = super().__getitem__(name)
+        if type(value) is _Unconverted:
+            return value.raw
+        raise KeyError(name)
+
+
+class LazyStructBlock(blocks.StructBlock):
+    """
+    A StructBlock which defers converting its children until they are read,
+    so reading one child of a large value doesn't deserialize the rest.
+    Children that are never read are saved back exactly as they were loaded.
+    """
+
+    class Meta:
+        value_class = LazyStructValue
+
+    def to_python(self, value):
+        return self._to_struct_value([
+            (name, _Unconverted(value[name]) if name in value else child_block.get_default())
+            for name, child_block in self.child_blocks.items()
+        ])
+
+    def bulk_to_python(self, values):
+        return [self.to_python(value) for value in values]
+
+    def get_prep_value(self, value):
+        if not isinstance(value, LazyStructValue):
+            return super().get_prep_value(value)
+
+        prep_value = {}
+        for name in value:
+            try:
+                prep_value[name] = value.get_raw(name)
+            except KeyError:
+                prep_value[name] = self.child_blocks[name].get_prep_value(value[name])
+        return prep_value
+
+
+def _get_hash_data(value):
+    """
+    Returns a value as submitted from a form, before clean has converted it,
+    as data for json.dumps. Unread children of lazy values stay unconverted.
+    """
+    if type(value) is _Unconverted:
+        return value.raw
+    if isinstance(value, Mapping):
+        items = dict.items(value) if isinstance(value, dict) else value.items()
+        return {name: _get_hash_data(child) for name, child in items}
+    if isinstance(value, Iterable) and not isinstance(value, str):
+        return [_get_hash_data(child) for child in value]
+    return value
+
+
+class _CleanHashEncoder(DjangoJSONEncoder):
+
+    def default(self, o):
+        try:
+            return super().default(o)
+        except TypeError:
+            return str(o)
+
+
+class _CleanBatch:
+    """
+    The cache keys and cached values of a CleanOnceStreamBlock's children,
+    read at once, and the values they are cleaned to, to write at once.
+    """
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.cached = cache.get_many(keys.values())
+        self.cleaned = defaultdict(dict)
+
+    def save(self):
+        for timeout, values in self.cleaned.items():
+            cache.set_many(values, timeout)
+
+
+_clean_batch = ContextVar('wagtail_extensions_clean_batch', default=None)
+
+
+class CleanOnceMixin:
+    """
+    Remembers values that were cleaned successfully, by a hash of the
+    submitted value, and returns the cleaned value again instead of
+    re-validating it. Saving a long stream then only validates the blocks
+    that changed.
+
+    Hashes include the date, so date-dependent validation runs again daily.
+    """
+    CLEAN_CACHE_KEY = "wagtail_extensions_cleaned_{}"
+    clean_cache_timeout = 60 * 60 * 24
+
+    def get_clean_cache_key(self, value):
+        data = json.dumps(_get_hash_data(value), cls=_CleanHashEncoder, sort_keys=True, separators=(',', ':'))
+        block_path = '{}.{}'.format(type(self).__module__, type(self).__qualname__)
+        digest = hashlib.sha1('{}:{:%Y%m%d}:{}'.format(block_path, clock.today(), data).encode()).hexdigest()
+        return self.CLEAN_CACHE_KEY.format(digest)
+
+    def clean(self, value):
+        batch = _clean_batch.get()
+        cache_key = batch.keys.get(id(value)) if batch else None
+        batched = cache_key is not None
+        if batched:
+            cleaned = batch.cached.get(cache_key)
+        else:
+            # Not a child of a CleanOnceStreamBlock
+            cache_key = self.get_clean_cache_key(value)
+            cleaned = cache.get(cache_key)
+        if cleaned is not None:
+            return self.to_python(cleaned)
+
+        cleaned = super().clean(value)
+        if batched:
+            batch.cleaned[self.clean_cache_timeout][cache_key] = self.get_prep_value(cleaned)
+        else:
+            cache.set(cache_key, self.get_prep_value(cleaned), self.clean_cache_timeout)
+        return cleaned
+
+
+class CleanOnceStreamBlock(blocks.StreamBlock):
+    """
+    A StreamBlock that reads the cleaned values of its CleanOnceMixin
+    children from the cache in one go, and writes those it cleans in one go,
+    rather than once per child.
+    """
+
+    def clean(self, value):
+        batch = _CleanBatch({
+            id(child.value): child.block.get_clean_cache_key(child.value)
+            for child in value if isinstance(child.block, CleanOnceMixin)
+        })
+        token = _clean_batch.set(batch)
+        try:
+            return super().clean(value)
+        finally:
+            _clean_batch.reset(token)
+            # Including the valid children of an invalid stream
+            batch.save()
+
+
 class LinkBlockStructValue(blocks.StructValue):
 
     @cached_property
@@ -67,7 +275,7 @@ class LinkBlockStructValue(blocks.StructValue):
         return link_text
 
 
-class LinkBlock(blocks.StructBlock):
+class LinkBlock(instrumentation.InstrumentedBlockMixin, blocks.StructBlock):
 
     text = blocks.CharBlock(required=False)
     # required=False because of https://github.com/wagtail/wagtail/issues/2665
@@ -96,7 +304,10 @@ class LinkBlock(blocks.StructBlock):
         value_class = LinkBlockStructValue
 
 
-class CarouselItemBlock(blocks.StructBlock):
+class CarouselItemBlock(instrumentation.InstrumentedBlockMixin, blocks.StructBlock):
+
+    FALLBACK_FILTER = 'fill-1600x600'
+    SRCSET_FILTERS = ('fill-800x300', 'fill-1200x450', 'fill-1600x600')
 
     image = ImageChooserBlock()
     caption = blocks.CharBlock(required=False)
@@ -105,8 +316,21 @@ class CarouselItemBlock(blocks.StructBlock):
     class Meta:
         template = 'wagtail_extensions/blocks/carousel_item.html'
 
+    def get_context(self, value, parent_context=None):
+        ctx = super().get_context(value, parent_context=parent_context)
+        ctx['srcset_filters'] = self.SRCSET_FILTERS
+        return ctx
+
+    def get_rendition_specs(self, value):
+        image = value.get('image')
+        if image:
+            for filter_spec in (self.FALLBACK_FILTER,) + self.SRCSET_FILTERS:
+                yield image, filter_spec
 
-class CarouselBlock(blocks.StructBlock):
+
+class CarouselBlock(instrumentation.InstrumentedBlockMixin, blocks.StructBlock):
+
+    THUMBNAIL_FILTER = 'fill-60x60'
 
     items = blocks.ListBlock(CarouselItemBlock())
     show_thumbnails = blocks.BooleanBlock(default=False, required=False)
@@ -120,8 +344,16 @@ class CarouselBlock(blocks.StructBlock):
         ctx['show_indicators'] = len(value.get('items', [])) > 1
         return ctx
 
+    def get_rendition_specs(self, value):
+        items = value.get('items', [])
+        item_block = self.child_blocks['items'].child_block
+        for item in items:
+            yield from item_block.get_rendition_specs(item)
+            if value.get('show_thumbnails') and len(items) > 1 and item.get('image'):
+                yield item['image'], self.THUMBNAIL_FILTER
 
-class AddressBlock(blocks.StructBlock):
+
+class AddressBlock(instrumentation.InstrumentedBlockMixin, blocks.StructBlock):
 
     lines = blocks.ListBlock(blocks.CharBlock(label="Line", required=False))
 
@@ -130,19 +362,35 @@ class AddressBlock(blocks.StructBlock):
 
 
 class PhoneBlock(blocks.FieldBlock):
+    """
+    A phone number, parsed with libphonenumber (see wagtail_extensions.phone),
+    which is only imported once a number is read or edited.
+    """
 
     def __init__(self, required=True, help_text=None, **kwargs):
-        self.field = PhoneNumberField(required=required, help_text=help_text)
+        self.field_options = {'required': required, 'help_text': help_text}
         super().__init__(**kwargs)
 
+    @cached_property
+    def field(self):
+        from phonenumber_field.formfields import PhoneNumberField
+        return PhoneNumberField(**self.field_options)
+
+    @property
+    def required(self):
+        return self.field_options['required']
+
     def get_prep_value(self, value):
         return str(value)
 
     def to_python(self, value):
-        return phonenumber.to_python(value)
+        from . import phone
+        if value and isinstance(value, str):
+            return phone.parse_phone_number(value, getattr(settings, 'PHONENUMBER_DEFAULT_REGION', None))
+        return phone.to_python(value)
 
 
-class DepartmentBlock(blocks.StructBlock):
+class DepartmentBlock(LazyStructBlock):
 
     name = blocks.CharBlock(required=False)
     phones = StrippedListBlock(PhoneBlock(required=False))
@@ -162,7 +410,64 @@ class DepartmentBlock(blocks.StructBlock):
         return super().clean(value)
 
 
-class OpeningTimeBlock(blocks.StructBlock):
+class OpeningTimeValue(Mapping):
+    """
+    A compact, slotted stand-in for StructValue. A location list can hold
+    thousands of opening times, and each StructValue is a full OrderedDict.
+    """
+    FIELDS = ('weekday', 'label', 'date', 'start', 'end', 'closed')
+    __slots__ = ('block', '_extra') + FIELDS
+
+    def __init__(self, block, items=()):
+        self.block = block
+        self._extra = None
+        for name in self.FIELDS:
+            setattr(self, name, None)
+        for name, value in (items.items() if isinstance(items, Mapping) else items):
+            self[name] = value
+
+    def __getitem__(self, name):
+        if name in self.FIELDS:
+            return getattr(self, name)
+        if self._extra is not None and name in self._extra:
+            return self._extra[name]
+        raise KeyError(name)
+
+    def __setitem__(self, name, value):
+        if name in self.FIELDS:
+            setattr(self, name, value)
+        else:
+            # Only subclasses of OpeningTimeBlock with extra children get here
+            if self._extra is None:
+                self._extra = {}
+            self._extra[name] = value
+
+    def __iter__(self):
+        yield from self.FIELDS
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self):
+        return len(self.FIELDS) + len(self._extra or ())
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, dict(self.items()))
+
+    def __html__(self):
+        return self.block.render(self)
+
+    def render_as_block(self, context=None):
+        return self.block.render(self, context=context)
+
+    @property
+    def bound_blocks(self):
+        return OrderedDict([
+            (name, block.bind(self.get(name)))
+            for name, block in self.block.child_blocks.items()
+        ])
+
+
+class OpeningTimeBlock(instrumentation.InstrumentedBlockMixin, blocks.StructBlock):
     """
     A semi-structured opening times block.
     """
@@ -180,13 +485,15 @@ class OpeningTimeBlock(blocks.StructBlock):
 
     class Meta:
         template = 'wagtail_extensions/blocks/opening_time.html'
+        value_class = OpeningTimeValue
 
     def clean(self, value):
         cleaned = super().clean(value)
         start, end, weekday, date = map(cleaned.get, ['start', 'end', 'weekday', 'date'])
         errors = defaultdict(ErrorList)
 
-        if date and date < datetime.date.today():
+        # The same today as CleanOnceMixin cache keys
+        if date and date < clock.today():
             err = ValidationError('Dates need to be in the future')
             errors['date'].append(err)
 
@@ -214,6 +521,10 @@ class OpeningTimeBlock(blocks.StructBlock):
                 value['label'] = self.PUBLIC_LABEL
         return value
 
+    def bulk_to_python(self, values):
+        # StructBlock's bulk conversion would bypass the weekday handling in to_python
+        return [self.to_python(value) for value in values]
+
     @classmethod
     def single_date(cls, value):
         if value.get('date'):
@@ -227,14 +538,17 @@ class OpeningTimeBlock(blocks.StructBlock):
     def next_date(cls, value):
         weekday = value.get('weekday')
         if weekday is not None and weekday != cls.PUBLIC:
-            # Next date with this weekday
-            today = now().date()
-            return today + relativedelta(weekday=weekday)
+            today = clock.today()
+            if isinstance(weekday, int) and 0 <= weekday <= 6:
+                # Next date with this weekday
+                return clock.next_weekday_dates(today)[weekday]
+            # Not a weekday, e.g. the blank choice
+            return today
         else:
             return None
 
 
-class OpeningTimesBlock(blocks.StructBlock):
+class OpeningTimesBlock(instrumentation.InstrumentedBlockMixin, LazyStructBlock):
     """
     Using a StructBlock as subclassing ListBlock leads to problems when
     Wagtail does template rendering.
@@ -266,19 +580,76 @@ class OpeningTimesBlock(blocks.StructBlock):
         ctx['today'] = self.opening_today(value)
         return ctx
 
+    def render(self, value, context=None):
+        # The template works out each time's next date; keep them on the same day
+        with clock.frozen_today():
+            return super().render(value, context=context)
+
     @staticmethod
     def get_time_for_date(value, date):
         if value:
             times = value.get('times')
             specific_times = utils.first_true(times, lambda x: x.get('date') == date)
+            if not specific_times and holidays.is_public_holiday(date):
+                specific_times = utils.first_true(times, lambda x: x.get('weekday') == OpeningTimeBlock.PUBLIC)
             times = specific_times or utils.first_true(times, lambda x: x.get('weekday') == date.weekday())
             if times:
                 return dict(times)
         return None
 
+    @staticmethod
+    def iter_schedule(value, start, end):
+        """
+        Yields (date, opening_time) for every date from start to end inclusive,
+        resolved as get_time_for_date would, but from lookup tables built once
+        for the whole range. opening_time is None for days without one.
+        """
+        times = (value.get('times') if value else None) or []
+        by_date, by_weekday, public = {}, [None] * 7, None
+        for time in times:
+            date, weekday = time.get('date'), time.get('weekday')
+            if date:
+                by_date.setdefault(date, time)
+            if weekday == OpeningTimeBlock.PUBLIC:
+                public = public or time
+            elif weekday in range(7):
+                by_weekday[weekday] = by_weekday[weekday] or time
+
+        public_holidays = holidays.get_public_holidays(start, end) if public else ()
+        weekday = start.weekday()
+        for offset in range((end - start).days + 1):
+            date = start + datetime.timedelta(days=offset)
+            time = by_date.get(date)
+            if not time and date in public_holidays:
+                time = public
+            yield date, time or by_weekday[(weekday + offset) % 7]
+
+    @staticmethod
+    def schedule_keyfunc(day):
+        opening_time = day[1]
+        if opening_time is None or OpeningTimeBlock.single_date(opening_time):
+            return opening_time
+        return (
+            opening_time.get('closed'),
+            opening_time.get('start'),
+            opening_time.get('end'),
+        )
+
+    @classmethod
+    def group_schedule(cls, value, start, end):
+        """
+        Collapses iter_schedule into (first_date, last_date, opening_time) runs
+        of consecutive days with the same hours, like group_times.
+        """
+        for key, group in groupby(cls.iter_schedule(value, start, end), cls.schedule_keyfunc):
+            first = last = next(group)
+            for last in group:
+                pass
+            yield first[0], last[0], first[1]
+
     @classmethod
     def opening_today(cls, value, cache_key=None):
-        today = now().date()
+        today = clock.today()
         partialed_getter = partial(cls.get_time_for_date, value, today)
         if cache_key:
             return cache.get_or_set(cache_key, partialed_getter, 60*60*24)
@@ -286,25 +657,83 @@ class OpeningTimesBlock(blocks.StructBlock):
             return partialed_getter()
 
 
-class LocationBlock(blocks.StructBlock):
+class LazyGeoBlock(blocks.FieldBlock):
+    """
+    Stands in for wagtailgeowidget's GeoBlock, which is only created when the
+    block is edited; importing it loads GeoDjango and GDAL.
+    """
+
+    class Meta:
+        icon = 'site'
+
+    def __init__(self, required=True, help_text=None, **kwargs):
+        self.field_options = {'required': required, 'help_text': help_text}
+        super().__init__(**kwargs)
+
+    @cached_property
+    def geo_block(self):
+        from wagtailgeowidget.blocks import GeoBlock
+        args, kwargs = self._constructor_args
+        block = GeoBlock(*args, **kwargs)
+        block.set_name(self.name)
+        return block
+
+    @property
+    def field(self):
+        return self.geo_block.field
+
+    @property
+    def required(self):
+        return self.field_options['required']
+
+    def value_for_form(self, value):
+        return self.geo_block.value_for_form(value)
+
+    def value_from_form(self, value):
+        return self.geo_block.value_from_form(value)
+
+    def render_form(self, *args, **kwargs):
+        return self.geo_block.render_form(*args, **kwargs)
+
+    def to_python(self, value):
+        # Matches GeoBlock.to_python, without loading it
+        if not value or isinstance(value, dict):
+            return value
+        match = GEOS_POINT_PATTERN.match(value)
+        if not match:
+            return value
+        srid, lng, lat = match.groups()
+        return {'lat': lat, 'lng': lng, 'srid': srid}
+
+    def deconstruct(self):
+        # Keep migrations pointing at GeoBlock
+        path, args, kwargs = super().deconstruct()
+        return 'wagtailgeowidget.blocks.GeoBlock', args, kwargs
+
+
+class LocationBlock(CleanOnceMixin, LazyStructBlock):
     name = blocks.CharBlock()
     address = AddressBlock(required=False)
-    point = GeoBlock(required=False)
+    point = LazyGeoBlock(required=False)
     departments = blocks.ListBlock(DepartmentBlock(label="department", required=False))
     opening_times = OpeningTimesBlock(required=False)
     primary = blocks.BooleanBlock(default=False, required=False)
 
 
-class SocialMediaProfileBlock(blocks.StructBlock):
+def get_social_media_types():
+    return app_settings.SOCIAL_MEDIA_TYPES
 
-    icon = blocks.ChoiceBlock(choices=app_settings.SOCIAL_MEDIA_TYPES)
+
+class SocialMediaProfileBlock(instrumentation.InstrumentedBlockMixin, blocks.StructBlock):
+
+    icon = blocks.ChoiceBlock(choices=get_social_media_types)
     url = blocks.URLBlock()
 
     class Meta:
         template = 'wagtail_extensions/blocks/social_media_profile.html'
 
 
-class TextBlock(blocks.StructBlock):
+class TextBlock(instrumentation.InstrumentedBlockMixin, blocks.StructBlock):
 
     title = blocks.CharBlock(required=False)
     body = blocks.RichTextBlock()
@@ -313,15 +742,42 @@ class TextBlock(blocks.StructBlock):
         template = 'wagtail_extensions/blocks/text.html'
 
 
-class ImagesBlock(blocks.StructBlock):
+class ImagesBlock(instrumentation.InstrumentedBlockMixin, blocks.StructBlock):
+
+    FALLBACK_FILTER = 'fill-400x400'
+    # Widest Bootstrap container, and the width columns stack at below the md breakpoint
+    CONTAINER_WIDTH = 1140
+    STACKED_WIDTH = 720
 
     images = blocks.ListBlock(ImageChooserBlock(required=False))
 
     class Meta:
         template = 'wagtail_extensions/blocks/images.html'
 
+    @staticmethod
+    def get_column_width(images):
+        return math.floor(12 / len(images)) if images else 12
+
+    @classmethod
+    def get_srcset_filters(cls, column_width):
+        """
+        Square fill filters covering the column at 1x and 2x, and stacked on small screens.
+        """
+        column_px = math.ceil(cls.CONTAINER_WIDTH * column_width / 12)
+        widths = sorted({column_px, column_px * 2, cls.STACKED_WIDTH})
+        return tuple('fill-{0}x{0}'.format(width) for width in widths)
+
     def get_context(self, value, parent_context=None):
         ctx = super().get_context(value, parent_context=parent_context)
         images = value.get('images', None)
-        ctx['column_width'] = math.floor(12 / len(images)) if images else 12
+        ctx['column_width'] = self.get_column_width(images)
+        ctx['srcset_filters'] = self.get_srcset_filters(ctx['column_width'])
+        ctx['sizes'] = '(min-width: 768px) {:.4g}vw, 100vw'.format(ctx['column_width'] * 100 / 12)
         return ctx
+
+    def get_rendition_specs(self, value):
+        images = value.get('images', [])
+        filter_specs = (self.FALLBACK_FILTER,) + self.get_srcset_filters(self.get_column_width(images))
+        for image in filter(None, images):
+            for filter_spec in filter_specs:
+                yield image, filter_spec
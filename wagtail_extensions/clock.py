@@ -0,0 +1,58 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import datetime
+from functools import lru_cache
+
+from django.utils.timezone import now
+
+
+_today = ContextVar('wagtail_extensions_today', default=None)
+
+
+def today():
+    """
+    Returns today's date, fixed for the current request or render if one is
+    in progress, so everything on a page agrees on the date around midnight.
+    """
+    return _today.get() or now().date()
+
+
+@contextmanager
+def frozen_today():
+    """
+    Fixes today() for the duration of the block. Nested uses keep the date
+    from the outermost one.
+    """
+    if _today.get() is not None:
+        yield _today.get()
+        return
+
+    token = _today.set(now().date())
+    try:
+        yield _today.get()
+    finally:
+        _today.reset(token)
+
+
+@lru_cache(maxsize=8)
+def next_weekday_dates(date):
+    """
+    Returns the next date on or after date for each weekday, Monday first.
+    """
+    return tuple(
+        date + datetime.timedelta(days=(weekday - date.weekday()) % 7)
+        for weekday in range(7)
+    )
+
+
+class TodayMiddleware:
+    """
+    Fixes today() for the whole request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with frozen_today():
+            return self.get_response(request)
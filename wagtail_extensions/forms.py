@@ -9,6 +9,18 @@ from crispy_forms.bootstrap import StrictButton
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout
 
+from . import metrics
+
+
+class ContactReCaptchaField(ReCaptchaField):
+    """
+    Records the time taken to verify the captcha with Google.
+    """
+
+    def validate(self, value):
+        with metrics.contact_stage('captcha'):
+            super().validate(value)
+
 
 class ContactForm(forms.Form):
 
@@ -25,7 +37,7 @@ class ContactForm(forms.Form):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if getattr(settings, "RECAPTCHA_PUBLIC_KEY", False):
-            self.fields['captcha'] = ReCaptchaField(widget=ReCaptchaV3)
+            self.fields['captcha'] = ContactReCaptchaField(widget=ReCaptchaV3)
         self.helper = FormHelper()
         self.helper.form_tag = False
         self.helper.layout = Layout(
@@ -43,8 +55,9 @@ class ContactForm(forms.Form):
     def send_email(self, to, subject_template, txt_template, reply_to):
         context = self.get_email_context()
         from_email = settings.DEFAULT_FROM_EMAIL
-        subject = loader.render_to_string(subject_template, context)
-        message = loader.render_to_string(txt_template, context)
+        with metrics.contact_stage('email_render'):
+            subject = loader.render_to_string(subject_template, context)
+            message = loader.render_to_string(txt_template, context)
         msg = EmailMessage(
             subject.strip(),
             message,
@@ -52,7 +65,8 @@ class ContactForm(forms.Form):
             to,
             reply_to=reply_to
         )
-        msg.send()
+        with metrics.contact_stage('email_send'):
+            msg.send()
 
     def get_to(self, page):
         if page.enquiry_email:
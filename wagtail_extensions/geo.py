@@ -0,0 +1,102 @@
+from array import array
+from bisect import bisect_left, bisect_right
+import heapq
+import math
+import re
+
+
+EARTH_RADIUS_KM = 6371.0088
+# Length of one degree of latitude; no two points further apart than this in
+# latitude can be closer than it, which is what lets LocationIndex skip them.
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+POINT_PATTERN = re.compile(r'POINT\s*\(\s*(\S+)\s+(\S+)\s*\)', re.IGNORECASE)
+
+
+def parse_point(value):
+    """
+    Returns a (lat, lng) tuple from a GeoBlock value, either in its native
+    dict form or as stored ("SRID=4326;POINT(lng lat)"), or None.
+    """
+    try:
+        if isinstance(value, dict):
+            return float(value['lat']), float(value['lng'])
+        match = POINT_PATTERN.search(value or '')
+        if match:
+            return float(match.group(2)), float(match.group(1))
+    except (KeyError, TypeError, ValueError):
+        pass
+    return None
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    "Great-circle distance between two points, in km"
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class LocationIndex:
+    """
+    An immutable index of points for nearest and within-radius queries.
+
+    Points are packed into arrays sorted by latitude, so that a query only
+    measures the distance to points in a latitude band around it.
+    """
+    # Starting search radius for nearest(); it grows until enough points are found
+    initial_radius_km = 25
+
+    def __init__(self, points):
+        """
+        points is an iterable of (key, lat, lng) tuples.
+        """
+        entries = sorted((lat, lng, key) for key, lat, lng in points)
+        self.lats = array('d', (lat for lat, _, _ in entries))
+        self.rad_lats = array('d', map(math.radians, self.lats))
+        self.rad_lngs = array('d', (math.radians(lng) for _, lng, _ in entries))
+        self.cos_lats = array('d', map(math.cos, self.rad_lats))
+        self.keys = tuple(key for _, _, key in entries)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _band(self, lat, radius_km):
+        delta = radius_km / KM_PER_DEGREE_LAT
+        return bisect_left(self.lats, lat - delta), bisect_right(self.lats, lat + delta)
+
+    def _distances(self, lat, lng, start, stop):
+        rad_lat, rad_lng = math.radians(lat), math.radians(lng)
+        cos_lat = math.cos(rad_lat)
+        sin, asin, sqrt = math.sin, math.asin, math.sqrt
+        rad_lats, rad_lngs, cos_lats, keys = self.rad_lats, self.rad_lngs, self.cos_lats, self.keys
+        for i in range(start, stop):
+            a = (
+                sin((rad_lats[i] - rad_lat) / 2) ** 2
+                + cos_lat * cos_lats[i] * sin((rad_lngs[i] - rad_lng) / 2) ** 2
+            )
+            yield 2 * EARTH_RADIUS_KM * asin(sqrt(min(a, 1.0))), keys[i]
+
+    def within(self, lat, lng, radius_km):
+        """
+        Returns (distance_km, key) for every point within radius_km, nearest first.
+        """
+        start, stop = self._band(lat, radius_km)
+        return sorted(
+            (distance, key) for distance, key in self._distances(lat, lng, start, stop)
+            if distance <= radius_km
+        )
+
+    def nearest(self, lat, lng, k=1):
+        """
+        Returns (distance_km, key) for the k nearest points, nearest first.
+        """
+        if k < 1:
+            return []
+        radius_km = self.initial_radius_km
+        while True:
+            start, stop = self._band(lat, radius_km)
+            found = heapq.nsmallest(k, self._distances(lat, lng, start, stop))
+            # Anything outside the band is further away than radius_km
+            if (len(found) == k and found[-1][0] <= radius_km) or (start, stop) == (0, len(self)):
+                return found
+            radius_km *= 4
@@ -0,0 +1,55 @@
+"""
+Hole-punching for cached pages.
+
+While a page is rendered for the cache, the parts that depend on the request
+are rendered as markers: the CSRF token, templates included with the
+``{% uncached %}`` tag, such as messages, and session form submission
+tracking. fill_holes renders them for each request the cached page is served
+to.
+"""
+from contextlib import contextmanager
+import re
+
+from django.middleware.csrf import get_token
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+
+CSRF_TOKEN_MARKER = 'wagtail-extensions-hole-csrf-token'
+TEMPLATE_MARKER = '<!--wagtail-extensions-hole:{}-->'
+TEMPLATE_NAME_RE = re.compile(r'^[\w./-]+$')
+HOLE_RE = re.compile(r'<!--wagtail-extensions-hole:([\w./-]+)-->|' + CSRF_TOKEN_MARKER)
+
+
+def is_punching_holes(request):
+    return getattr(request, '_wagtail_extensions_punching_holes', False)
+
+
+@contextmanager
+def punching_holes(request):
+    """
+    Renders holes as markers while rendering for the cache.
+    """
+    request._wagtail_extensions_punching_holes = True
+    try:
+        yield
+    finally:
+        del request._wagtail_extensions_punching_holes
+
+
+def get_template_marker(template_name):
+    if not TEMPLATE_NAME_RE.match(template_name):
+        raise ValueError('{!r} is not a valid uncached template name'.format(template_name))
+    return mark_safe(TEMPLATE_MARKER.format(template_name))
+
+
+def fill_holes(content, request):
+    """
+    Returns cached content with its holes rendered for request.
+    """
+    def fill(match):
+        template_name = match.group(1)
+        if template_name:
+            return get_template(template_name).render({'request': request}, request)
+        return get_token(request)
+    return HOLE_RE.sub(fill, content)
@@ -0,0 +1,115 @@
+from bisect import bisect_left, bisect_right
+import datetime
+from functools import lru_cache
+import json
+import logging
+import os
+
+from django.core.signals import setting_changed
+from django.utils.module_loading import import_string
+
+from . import app_settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class BaseHolidayCalendar:
+    """
+    Supplies public holiday dates for a region. Subclasses implement
+    get_holidays; lookups go through a sorted tuple built once per region.
+
+    Holidays are assumed to be known for the whole years from the first to
+    the last date; lookups outside them log a warning, once per region and
+    year, as they would otherwise quietly find no holidays.
+    """
+
+    def __init__(self):
+        self._dates = {}
+        self._warned_years = set()
+
+    def get_holidays(self, region):
+        """
+        Returns an iterable of the region's public holiday dates.
+        """
+        raise NotImplementedError
+
+    def get_sorted_holidays(self, region):
+        try:
+            return self._dates[region]
+        except KeyError:
+            self._dates[region] = tuple(sorted(set(self.get_holidays(region))))
+            return self._dates[region]
+
+    def check_years(self, region, start, end=None):
+        """
+        Logs a warning for years from start to end that region's holidays
+        don't cover.
+        """
+        dates = self.get_sorted_holidays(region)
+        end = end or start
+        if dates and dates[0].year <= start.year and end.year <= dates[-1].year:
+            return
+        for year in range(start.year, end.year + 1):
+            if (dates and dates[0].year <= year <= dates[-1].year) or (region, year) in self._warned_years:
+                continue
+            self._warned_years.add((region, year))
+            logger.warning(
+                "No public holidays known for %s in %d; set WAGTAIL_EXTENSIONS_HOLIDAY_FILE to a file that has them",
+                region, year)
+
+    def is_holiday(self, date, region):
+        self.check_years(region, date)
+        dates = self.get_sorted_holidays(region)
+        i = bisect_left(dates, date)
+        return i < len(dates) and dates[i] == date
+
+
+class StaticHolidayCalendar(BaseHolidayCalendar):
+    """
+    Reads holidays from a JSON file mapping region codes to lists of ISO
+    dates. The bundled file covers England and Wales ("gb-eaw").
+    """
+    default_path = os.path.join(os.path.dirname(__file__), 'data', 'holidays.json')
+
+    def __init__(self, path=None):
+        super().__init__()
+        self.path = path or app_settings.HOLIDAY_FILE or self.default_path
+
+    def get_holidays(self, region):
+        with open(self.path) as f:
+            dates = json.load(f).get(region, [])
+        return [datetime.date.fromisoformat(date) for date in dates]
+
+
+@lru_cache(maxsize=None)
+def get_holiday_calendar():
+    return import_string(app_settings.HOLIDAY_CALENDAR)()
+
+
+def reset_holiday_calendar(setting=None, **kwargs):
+    if setting in ('WAGTAIL_EXTENSIONS_HOLIDAY_CALENDAR', 'WAGTAIL_EXTENSIONS_HOLIDAY_FILE'):
+        get_holiday_calendar.cache_clear()
+
+
+setting_changed.connect(reset_holiday_calendar, dispatch_uid='wagtail_extensions.holidays.reset_holiday_calendar')
+
+
+def is_public_holiday(date, region=None):
+    region = region or app_settings.HOLIDAY_REGION
+    if not region:
+        return False
+    return get_holiday_calendar().is_holiday(date, region)
+
+
+def get_public_holidays(start, end, region=None):
+    """
+    Returns the set of public holidays from start to end inclusive.
+    """
+    region = region or app_settings.HOLIDAY_REGION
+    if not region:
+        return frozenset()
+    calendar = get_holiday_calendar()
+    calendar.check_years(region, start, end)
+    dates = calendar.get_sorted_holidays(region)
+    return frozenset(dates[bisect_left(dates, start):bisect_right(dates, end)])
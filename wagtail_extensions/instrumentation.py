@@ -0,0 +1,154 @@
+"""
+Opt-in timing of template tags and block renders.
+
+With WAGTAIL_EXTENSIONS_INSTRUMENTATION enabled, each instrumented call
+records its wall time and database query count as a Timing. Timings are
+sent with the timing_recorded signal, passed to the sink
+(WAGTAIL_EXTENSIONS_INSTRUMENTATION_SINK, logging by default) and, under
+ServerTimingMiddleware, added to the response's Server-Timing header.
+
+Times and query counts include those of nested instrumented calls.
+"""
+from collections import OrderedDict, namedtuple
+from contextvars import ContextVar
+from functools import lru_cache, partial, wraps
+import logging
+import time
+
+from django.core.signals import setting_changed
+from django.db import connection
+from django.dispatch import Signal
+from django.utils.module_loading import import_string
+
+from . import app_settings
+
+
+logger = logging.getLogger(__name__)
+
+# Sent with timing, a Timing, for every instrumented call
+timing_recorded = Signal()
+
+Timing = namedtuple('Timing', ['name', 'duration', 'queries'])
+
+# The timings of the current request, when under ServerTimingMiddleware
+_request_timings = ContextVar('wagtail_extensions_request_timings', default=None)
+
+
+def log_timing(timing):
+    logger.debug('%s took %.2fms and %d queries', timing.name, timing.duration * 1000, timing.queries)
+
+
+@lru_cache(maxsize=None)
+def get_sink():
+    sink = app_settings.INSTRUMENTATION_SINK
+    return import_string(sink) if sink else None
+
+
+def reset_sink(setting=None, **kwargs):
+    if setting == 'WAGTAIL_EXTENSIONS_INSTRUMENTATION_SINK':
+        get_sink.cache_clear()
+
+
+setting_changed.connect(reset_sink, dispatch_uid='wagtail_extensions.instrumentation.reset_sink')
+
+
+def record(timing):
+    timing_recorded.send(sender=None, timing=timing)
+    sink = get_sink()
+    if sink:
+        sink(timing)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append(timing)
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def call(name, func, *args, **kwargs):
+    """
+    Returns func(*args, **kwargs), recording its time and queries under name
+    if instrumentation is enabled.
+    """
+    if not app_settings.INSTRUMENTATION:
+        return func(*args, **kwargs)
+
+    counter = QueryCounter()
+    start = time.perf_counter()
+    try:
+        with connection.execute_wrapper(counter):
+            return func(*args, **kwargs)
+    finally:
+        record(Timing(name, time.perf_counter() - start, counter.count))
+
+
+def instrument_tags(library, *names):
+    """
+    Records each render of the named tags of a template Library, including
+    rendering an inclusion tag's template, as "tag.<name>".
+    """
+    for name in names:
+        library.tags[name] = _instrument_compile_function(library.tags[name], 'tag.' + name)
+
+
+def _instrument_compile_function(compile_function, name):
+    @wraps(compile_function)
+    def compile(parser, token):
+        node = compile_function(parser, token)
+        node.render = partial(call, name, node.render)
+        return node
+    return compile
+
+
+class InstrumentedBlockMixin:
+    """
+    Records each render of a block as "block.<class name>".
+    """
+
+    def render(self, value, context=None):
+        if not app_settings.INSTRUMENTATION:
+            return super().render(value, context)
+        return call('block.' + type(self).__name__, super().render, value, context)
+
+
+class ServerTimingMiddleware:
+    """
+    Adds the request's timings to the Server-Timing header, one metric per
+    name with the total time, number of calls and queries.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not app_settings.INSTRUMENTATION:
+            return self.get_response(request)
+
+        token = _request_timings.set([])
+        try:
+            response = self.get_response(request)
+            timings = _request_timings.get()
+        finally:
+            _request_timings.reset(token)
+
+        if timings:
+            metrics = ', '.join(self.get_metrics(timings))
+            existing = response.get('Server-Timing')
+            response['Server-Timing'] = '{}, {}'.format(existing, metrics) if existing else metrics
+        return response
+
+    @staticmethod
+    def get_metrics(timings):
+        totals = OrderedDict()
+        for timing in timings:
+            duration, calls, queries = totals.get(timing.name, (0, 0, 0))
+            totals[timing.name] = (duration + timing.duration, calls + 1, queries + timing.queries)
+        for name, (duration, calls, queries) in totals.items():
+            yield '{};dur={:.2f};desc="{} calls / {} queries"'.format(name, duration * 1000, calls, queries)
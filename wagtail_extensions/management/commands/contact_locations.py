@@ -0,0 +1,348 @@
+"""
+Imports and exports the locations of a ContactDetailsSetting, as CSV or JSON
+lines.
+
+JSON lines have one location per line, as stored in the StreamField. CSV has
+a row per department and opening time, with the location's columns repeated
+on each of its rows; consecutive rows with the same name are one location.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import csv
+from functools import lru_cache
+from itertools import groupby, zip_longest
+import json
+import os
+import sys
+import uuid
+
+import django
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.forms.utils import ErrorList
+from wagtail.core.blocks import StreamValue
+from wagtail.core.models import Site
+
+from wagtail_extensions import geo
+from wagtail_extensions.blocks import OpeningTimeBlock
+from wagtail_extensions.models import ContactDetailsSetting
+
+
+LOCATION_COLUMNS = ['name', 'address', 'lat', 'lng', 'primary']
+DEPARTMENT_COLUMNS = ['department', 'phones', 'email', 'department_primary']
+OPENING_TIME_COLUMNS = ['weekday', 'label', 'date', 'start', 'end', 'closed']
+CSV_COLUMNS = LOCATION_COLUMNS + DEPARTMENT_COLUMNS + OPENING_TIME_COLUMNS
+
+WEEKDAY_NAMES = dict(OpeningTimeBlock.ALL_DAYS)
+WEEKDAYS = {name.lower(): weekday for weekday, name in OpeningTimeBlock.ALL_DAYS}
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+
+
+def parse_bool(value):
+    return (value or '').strip().lower() in TRUE_VALUES
+
+
+def parse_weekday(value):
+    value = (value or '').strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    try:
+        return WEEKDAYS[value.lower()]
+    except KeyError:
+        raise ValueError('Unknown weekday {!r}'.format(value))
+
+
+def csv_rows_to_location(rows):
+    """
+    Returns the stored value of a location from its CSV rows.
+    """
+    first = rows[0]
+    lat, lng = (first.get('lat') or '').strip(), (first.get('lng') or '').strip()
+    point = None
+    if lat or lng:
+        try:
+            point = 'SRID=4326;POINT({} {})'.format(float(lng), float(lat))
+        except ValueError:
+            raise ValueError('lat and lng must both be numbers')
+
+    departments, times = [], []
+    for row in rows:
+        if any(row.get(column) for column in DEPARTMENT_COLUMNS):
+            departments.append({
+                'name': row.get('department') or '',
+                'phones': [phone.strip() for phone in (row.get('phones') or '').split(';') if phone.strip()],
+                'email': row.get('email') or '',
+                'primary': parse_bool(row.get('department_primary')),
+            })
+        if any(row.get(column) for column in OPENING_TIME_COLUMNS):
+            times.append({
+                'weekday': parse_weekday(row.get('weekday')),
+                'label': row.get('label') or '',
+                'date': row.get('date') or None,
+                'start': row.get('start') or None,
+                'end': row.get('end') or None,
+                'closed': parse_bool(row.get('closed')),
+            })
+
+    return {
+        'name': first.get('name') or '',
+        'address': {'lines': (first.get('address') or '').splitlines()},
+        'point': point,
+        'departments': departments,
+        'opening_times': {'times': times},
+        'primary': parse_bool(first.get('primary')),
+    }
+
+
+def format_bool(value):
+    return 'true' if value else 'false'
+
+
+def list_items(value):
+    """
+    Returns the items of a stored ListBlock value, which are wrapped with
+    their ids since Wagtail 2.16.
+    """
+    return [
+        item['value'] if isinstance(item, dict) and item.get('type') == 'item' else item
+        for item in value or []
+    ]
+
+
+def location_to_csv_rows(value):
+    """
+    Returns the CSV rows of a location's stored value.
+    """
+    point = geo.parse_point(value.get('point')) or ('', '')
+    address = value.get('address') or {}
+    location = {
+        'name': value.get('name') or '',
+        'address': '\n'.join(line for line in list_items(address.get('lines')) if line),
+        'lat': point[0],
+        'lng': point[1],
+        'primary': format_bool(value.get('primary')),
+    }
+
+    departments = [{
+        'department': department.get('name') or '',
+        'phones': ';'.join(phone for phone in list_items(department.get('phones')) if phone),
+        'email': department.get('email') or '',
+        'department_primary': format_bool(department.get('primary')),
+    } for department in list_items(value.get('departments'))]
+
+    times = []
+    for time in list_items((value.get('opening_times') or {}).get('times')):
+        weekday = time.get('weekday')
+        try:
+            weekday = WEEKDAY_NAMES[int(weekday)]
+        except (KeyError, TypeError, ValueError):
+            pass
+        times.append({
+            'weekday': weekday if weekday is not None else '',
+            'label': time.get('label') or '',
+            'date': time.get('date') or '',
+            'start': time.get('start') or '',
+            'end': time.get('end') or '',
+            'closed': format_bool(time.get('closed')),
+        })
+
+    pairs = list(zip_longest(departments, times, fillvalue={})) or [({}, {})]
+    return [dict(location, **department, **time) for department, time in pairs]
+
+
+def get_error_messages(error, path=''):
+    """
+    Yields a "path: message" string for each error in a block's
+    ValidationError.
+    """
+    if isinstance(error, ErrorList):
+        for child in error.as_data():
+            yield from get_error_messages(child, path)
+        return
+
+    children = getattr(error, 'block_errors', None)
+    if children is None and isinstance(getattr(error, 'params', None), dict) \
+            and all(isinstance(child, (ErrorList, ValidationError)) for child in error.params.values()):
+        # As raised by DepartmentBlock and OpeningTimeBlock
+        children = error.params
+    if children:
+        items = children.items() if isinstance(children, dict) else enumerate(children)
+        for key, child in items:
+            if child is not None:
+                yield from get_error_messages(child, '{}.{}'.format(path, key) if path else str(key))
+        yield from get_error_messages(getattr(error, 'non_block_errors', ErrorList()), path)
+        return
+
+    for message in error.messages:
+        yield '{}: {}'.format(path, message) if path else message
+
+
+@lru_cache(maxsize=None)
+def get_location_block(model_label):
+    model = apps.get_model(model_label)
+    return model._meta.get_field('locations').stream_block.child_blocks['location']
+
+
+def clean_location(task):
+    """
+    Returns a location's cleaned, stored value and an empty list, or None
+    and its error messages. Runs in the worker processes.
+    """
+    model_label, data_format, data = task
+    block = get_location_block(model_label)
+    try:
+        if data_format == 'csv':
+            raw = csv_rows_to_location(data)
+        else:
+            raw = json.loads(data)
+            if not isinstance(raw, dict):
+                raise ValueError('Each line must be a JSON object')
+        value = block.clean(block.to_python(raw))
+    except ValidationError as e:
+        return None, list(get_error_messages(e))
+    except (TypeError, ValueError) as e:
+        return None, [str(e)]
+    return block.get_prep_value(value), []
+
+
+def read_csv(file):
+    """
+    Yields the line number and rows of each location in a CSV file.
+    """
+    reader = csv.DictReader(file)
+    if 'name' not in (reader.fieldnames or []):
+        raise CommandError('The CSV must have a name column')
+    rows = ((reader.line_num, row) for row in reader)
+    for _, group in groupby(rows, key=lambda item: item[1].get('name')):
+        group = list(group)
+        yield group[0][0], [row for _, row in group]
+
+
+def read_jsonl(file):
+    for line_number, line in enumerate(file, 1):
+        if line.strip():
+            yield line_number, line
+
+
+class Command(BaseCommand):
+    help = "Imports or exports a ContactDetailsSetting's locations as CSV or JSON lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['import', 'export'])
+        parser.add_argument('model', help='The ContactDetailsSetting model, e.g. "myapp.ContactDetails"')
+        parser.add_argument('path', nargs='?', default='-', help='The file to read or write; "-" for stdin or stdout')
+        parser.add_argument('--site', help='Hostname or id of the site; the default site if not given')
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'],
+            help='csv for .csv files and jsonl otherwise if not given')
+        parser.add_argument(
+            '--append', action='store_true',
+            help='Add to the existing locations rather than replace them')
+        parser.add_argument('--dry-run', action='store_true', help='Validate the locations without saving them')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Number of processes validating locations; 1 validates them in this process')
+        parser.add_argument('--chunk-size', type=int, default=100, help='Locations sent to a worker at a time')
+
+    def handle(self, action, model, path, **options):
+        model = self.get_model(model)
+        site = self.get_site(options['site'])
+        data_format = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        if action == 'import':
+            self.import_locations(model, site, path, data_format, options)
+        else:
+            self.export_locations(model, site, path, data_format)
+
+    def get_model(self, label):
+        try:
+            model = apps.get_model(label)
+        except (LookupError, ValueError) as e:
+            raise CommandError(e)
+        if not issubclass(model, ContactDetailsSetting):
+            raise CommandError('{} is not a ContactDetailsSetting'.format(label))
+        return model
+
+    def get_site(self, site):
+        if not site:
+            try:
+                return Site.objects.get(is_default_site=True)
+            except Site.DoesNotExist:
+                raise CommandError('There is no default site; choose one with --site')
+        lookup = {'pk': int(site)} if site.isdigit() else {'hostname': site}
+        try:
+            return Site.objects.get(**lookup)
+        except Site.DoesNotExist:
+            raise CommandError('No site {}'.format(site))
+
+    @contextmanager
+    def open(self, path, mode):
+        if path == '-':
+            yield sys.stdin if mode == 'r' else self.stdout
+        else:
+            with open(path, mode, newline='', encoding='utf-8') as file:
+                yield file
+
+    def clean_locations(self, model, items, data_format, workers, chunk_size):
+        """
+        Yields the line number, value and errors of each location, validating
+        them in a pool of worker processes.
+        """
+        line_numbers, tasks = [], []
+        for line_number, data in items:
+            line_numbers.append(line_number)
+            tasks.append((model._meta.label, data_format, data))
+
+        if workers > 1 and len(tasks) > chunk_size:
+            with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+                yield from zip(line_numbers, executor.map(clean_location, tasks, chunksize=chunk_size))
+        else:
+            yield from zip(line_numbers, map(clean_location, tasks))
+
+    def import_locations(self, model, site, path, data_format, options):
+        with self.open(path, 'r') as file:
+            items = read_csv(file) if data_format == 'csv' else read_jsonl(file)
+            results = self.clean_locations(model, items, data_format, options['workers'], options['chunk_size'])
+
+            values, invalid = [], 0
+            for line_number, (value, errors) in results:
+                if errors:
+                    invalid += 1
+                    for error in errors:
+                        self.stderr.write('Line {}: {}'.format(line_number, error))
+                else:
+                    values.append(value)
+
+        if invalid:
+            raise CommandError('{} of {} locations are invalid; nothing was imported'.format(
+                invalid, invalid + len(values)))
+        if options['dry_run']:
+            self.stdout.write('{} locations are valid'.format(len(values)))
+            return
+
+        with transaction.atomic():
+            setting = model.for_site(site)
+            raw_data = list(setting.locations.raw_data) if options['append'] else []
+            raw_data.extend({'type': 'location', 'value': value, 'id': str(uuid.uuid4())} for value in values)
+            # Stored as validated, without converting the values again
+            setting.locations = StreamValue(setting.locations.stream_block, raw_data, is_lazy=True)
+            setting.save()
+        self.stdout.write(self.style.SUCCESS('Imported {} locations'.format(len(values))))
+
+    def export_locations(self, model, site, path, data_format):
+        setting = model.objects.filter(site=site).first()
+        # Reads the stored JSON, so no location is deserialized
+        items = setting.locations.raw_data if setting else []
+        with self.open(path, 'w') as file:
+            if data_format == 'csv':
+                writer = csv.DictWriter(file, CSV_COLUMNS)
+                writer.writeheader()
+                for item in items:
+                    writer.writerows(location_to_csv_rows(item['value']))
+            else:
+                for item in items:
+                    file.write(json.dumps(item['value'], cls=DjangoJSONEncoder) + '\n')
@@ -0,0 +1,109 @@
+import hashlib
+import logging
+import struct
+from urllib.parse import urlencode
+from urllib.request import urlopen
+import zlib
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils.module_loading import import_string
+
+from . import app_settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class BaseStaticMapRenderer:
+    """
+    Renders a PNG image of a map centred on, and marking, a single point.
+    """
+    name = None
+
+    def render(self, lat, lng, zoom, width, height):
+        raise NotImplementedError
+
+
+class GoogleStaticMapRenderer(BaseStaticMapRenderer):
+
+    name = 'google'
+    api_url = 'https://maps.googleapis.com/maps/api/staticmap'
+    timeout = 10
+
+    def render(self, lat, lng, zoom, width, height):
+        point = '{},{}'.format(lat, lng)
+        query = urlencode({
+            'center': point,
+            'markers': point,
+            'zoom': zoom,
+            'size': '{}x{}'.format(width, height),
+            'key': app_settings.GOOGLE_MAPS_V3_APIKEY or '',
+        })
+        with urlopen('{}?{}'.format(self.api_url, query), timeout=self.timeout) as response:
+            return response.read()
+
+
+class PlaceholderStaticMapRenderer(BaseStaticMapRenderer):
+    """
+    Draws a plain background with a marker in the middle. Needs no network
+    access, so is suitable for tests and local development.
+    """
+    name = 'placeholder'
+    background = (229, 227, 223)
+    marker = (234, 67, 53)
+    marker_radius = 8
+
+    def render(self, lat, lng, zoom, width, height):
+        cx, cy, r2 = width // 2, height // 2, self.marker_radius ** 2
+        background, marker = bytes(self.background), bytes(self.marker)
+        rows = []
+        for y in range(height):
+            rows.append(b'\x00' + b''.join(
+                marker if (x - cx) ** 2 + (y - cy) ** 2 <= r2 else background
+                for x in range(width)
+            ))
+        return b''.join([
+            b'\x89PNG\r\n\x1a\n',
+            self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)),
+            self._chunk(b'IDAT', zlib.compress(b''.join(rows))),
+            self._chunk(b'IEND', b''),
+        ])
+
+    @staticmethod
+    def _chunk(tag, data):
+        crc = zlib.crc32(tag + data) & 0xffffffff
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', crc)
+
+
+def get_static_map_renderer():
+    return import_string(app_settings.STATIC_MAP_RENDERER)()
+
+
+def get_static_map_url(location, zoom):
+    """
+    Returns the URL of a static map image for the location, rendering and
+    storing it the first time a point, zoom and size is requested, or None if
+    it can't be rendered, to show the interactive map instead.
+    """
+    renderer = get_static_map_renderer()
+    lat, lng = float(location['lat']), float(location['lng'])
+    width, height = app_settings.STATIC_MAP_SIZE
+    key = '{}:{:.6f}:{:.6f}:{}:{}x{}'.format(renderer.name, lat, lng, zoom, width, height)
+    cache_key = 'wagtail_extensions_static_map_' + hashlib.md5(key.encode()).hexdigest()
+
+    url = cache.get(cache_key)
+    if url is None:
+        name = 'wagtail_extensions/maps/{}.png'.format(cache_key)
+        if not default_storage.exists(name):
+            try:
+                content = renderer.render(lat, lng, zoom, width, height)
+            except OSError:
+                # Including URLError and HTTPError from the maps API
+                logger.exception('Could not render the static map %s', key)
+                return None
+            name = default_storage.save(name, ContentFile(content))
+        url = default_storage.url(name)
+        cache.set(cache_key, url, None)
+    return url
@@ -0,0 +1,54 @@
+import uuid
+
+from django.core.cache import cache
+from django.urls import NoReverseMatch, reverse
+
+
+TREE_VERSION_CACHE_KEY = 'wagtail_extensions_page_tree_version'
+
+
+def get_tree_version():
+    """
+    Returns a token that changes whenever pages are published, unpublished,
+    moved, deleted or given view restrictions, for keying cached menus.
+    """
+    return cache.get_or_set(TREE_VERSION_CACHE_KEY, lambda: uuid.uuid4().hex, None)
+
+
+def bump_tree_version():
+    cache.set(TREE_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+
+def get_menu_children(page):
+    return page.get_children().live().in_menu()
+
+
+def get_children_url(page, tree_version):
+    """
+    Returns the URL of the JSON for page's menu children, or None if it has
+    no children or wagtail_extensions.urls isn't included.
+    """
+    if not page.numchild:
+        return None
+    try:
+        url = reverse('wagtail_extensions:menu_children', args=[page.pk])
+    except NoReverseMatch:
+        return None
+    return '{}?v={}'.format(url, tree_version)
+
+
+def get_menu_items(page, request=None):
+    """
+    Returns page's public menu children as dicts, for serving as JSON. The
+    JSON is cached for everyone, so pages with view restrictions are left out.
+    """
+    tree_version = get_tree_version()
+    return [
+        {
+            'id': child.pk,
+            'title': child.title,
+            'url': child.get_url(request),
+            'children_url': get_children_url(child, tree_version),
+        }
+        for child in get_menu_children(page).public()
+    ]
@@ -0,0 +1,172 @@
+"""
+In-process counters and latency histograms, with a Prometheus text
+exposition (see views.MetricsView).
+
+Each process keeps its own registry, so under several workers each reports
+its own share.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+import threading
+import time
+
+
+# Upper bounds in seconds; covers fast validation up to slow SMTP servers
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{{{}}}'.format(','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    ))
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError('{} takes labels {}'.format(self.name, ', '.join(self.labelnames)))
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def expose(self):
+        yield '# HELP {} {}'.format(self.name, self.documentation)
+        yield '# TYPE {} {}'.format(self.name, self.type)
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield from self.expose_value(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def expose_value(self, key, value):
+        yield '{}{} {}'.format(self.name, format_labels(key), format_value(value))
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        # Observations in each bucket, with a last one for those above all bounds
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, (None, 0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def get_count(self, **labels):
+        counts, _ = self._values.get(self._key(labels), ((), 0))
+        return sum(counts)
+
+    def expose_value(self, key, value):
+        counts, total = value
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            yield '{}_bucket{} {}'.format(self.name, format_labels(key + (('le', bound),)), cumulative)
+        yield '{}_sum{} {}'.format(self.name, format_labels(key), format_value(total))
+        yield '{}_count{} {}'.format(self.name, format_labels(key), cumulative)
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError('{} is already registered'.format(metric.name))
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    def expose(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        for metric in self.metrics.values():
+            metric.clear()
+
+
+registry = Registry()
+
+contact_submissions = registry.counter(
+    'wagtail_extensions_contact_submissions_total',
+    'Contact form submissions by outcome: sent, invalid or error',
+    labelnames=['outcome'],
+)
+contact_stage_seconds = registry.histogram(
+    'wagtail_extensions_contact_stage_seconds',
+    'Time spent in each stage of handling a contact form submission',
+    labelnames=['stage'],
+)
+contact_stage_failures = registry.counter(
+    'wagtail_extensions_contact_stage_failures_total',
+    'Contact form submission stages that raised an exception',
+    labelnames=['stage'],
+)
+
+
+@contextmanager
+def contact_stage(stage):
+    """
+    Times a stage of handling a contact form submission, and counts it as a
+    failure if it raises.
+    """
+    with contact_stage_seconds.time(stage=stage):
+        try:
+            yield
+        except Exception:
+            contact_stage_failures.inc(stage=stage)
+            raise
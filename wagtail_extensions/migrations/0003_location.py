@@ -0,0 +1,76 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtailcore', '0001_initial'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('wagtail_extensions', '0002_alter_contactsubmission_data'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sort_order', models.PositiveIntegerField()),
+                ('name', models.CharField(db_index=True, max_length=255)),
+                ('address', models.TextField(blank=True)),
+                ('lat', models.FloatField(blank=True, db_index=True, null=True)),
+                ('lng', models.FloatField(blank=True, db_index=True, null=True)),
+                ('primary', models.BooleanField(default=False)),
+                ('setting_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='wagtailcore.site')),
+            ],
+            options={
+                'ordering': ['site', 'sort_order'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LocationDepartment',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sort_order', models.PositiveIntegerField()),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('email', models.EmailField(blank=True, db_index=True, max_length=254)),
+                ('primary', models.BooleanField(default=False)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='departments', to='wagtail_extensions.location')),
+            ],
+            options={
+                'ordering': ['location', 'sort_order'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LocationPhone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sort_order', models.PositiveIntegerField()),
+                ('number', models.CharField(db_index=True, max_length=32)),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='phones', to='wagtail_extensions.locationdepartment')),
+            ],
+            options={
+                'ordering': ['department', 'sort_order'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LocationOpeningTime',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sort_order', models.PositiveIntegerField()),
+                ('weekday', models.PositiveSmallIntegerField(blank=True, db_index=True, null=True)),
+                ('label', models.CharField(blank=True, max_length=255)),
+                ('date', models.DateField(blank=True, db_index=True, null=True)),
+                ('start', models.TimeField(blank=True, null=True)),
+                ('end', models.TimeField(blank=True, null=True)),
+                ('closed', models.BooleanField(default=False)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='opening_times', to='wagtail_extensions.location')),
+            ],
+            options={
+                'ordering': ['location', 'sort_order'],
+            },
+        ),
+    ]
@@ -1,11 +1,18 @@
+import hashlib
+from urllib.parse import urlencode
+
 from django.contrib import messages
+from django.core.cache import cache
 from django.db import models
-from django.http import HttpResponseRedirect
-from django.utils import timezone
+from django.http import HttpResponse, HttpResponseRedirect
 
 from wagtail.admin.edit_handlers import FieldPanel
 from wagtail.core.models import Page
 
+from . import holepunch
+from . import menus
+from . import metrics
+from . import tracking
 from .forms import ContactForm
 from .models import ContactSubmission
 
@@ -32,6 +39,13 @@ class ContactMixin(models.Model):
     success_url = None
     store_submissions = True
     success_message = 'Thank you! We will get back to you as soon as possible.'
+    # Seconds to cache the page rendered for GET requests; 0 disables it
+    page_cache_timeout = 0
+    # Query parameters the page renders differently for; requests that differ
+    # only in other parameters share the cached page
+    page_cache_query_params = ()
+
+    PAGE_CACHE_KEY = "wagtail_extensions_contact_page_{}_{}_{}_{}"
 
     enquiry_email = models.EmailField(
         blank=True,
@@ -55,26 +69,96 @@ class ContactMixin(models.Model):
         if self.store_submissions:
             ContactSubmission.objects.create(data=form_data)
 
+    def is_page_cacheable(self, request):
+        """
+        Returns whether the page may be served from the cache: anonymous GETs
+        outside previews.
+        """
+        if not self.page_cache_timeout or request.method not in ('GET', 'HEAD'):
+            return False
+        if getattr(request, 'is_preview', False):
+            return False
+        user = getattr(request, 'user', None)
+        return not (user and user.is_authenticated)
+
+    def get_page_cache_key(self, request):
+        params = sorted(
+            (name, values) for name, values in request.GET.lists() if name in self.page_cache_query_params)
+        url = request.path + '?' + urlencode(params, doseq=True)
+        url = hashlib.sha1(url.encode()).hexdigest()
+        # Menus on the page change with the page tree
+        return self.PAGE_CACHE_KEY.format(self.pk, self.live_revision_id, menus.get_tree_version(), url)
+
+    def serve_cached(self, request, *args, **kwargs):
+        """
+        Serves the page from the cache, with the CSRF token and uncached
+        templates filled in for request.
+        """
+        cache_key = self.get_page_cache_key(request)
+        cached = cache.get(cache_key)
+        status = 200
+        if cached is None:
+            self.form = self.get_form(request)
+            with holepunch.punching_holes(request):
+                response = super().serve(request, *args, **kwargs)
+                response.render()
+            cached = (response.content.decode(response.charset), response['Content-Type'])
+            status = response.status_code
+            if status == 200:
+                cache.set(cache_key, cached, self.page_cache_timeout)
+
+        content, content_type = cached
+        return HttpResponse(holepunch.fill_holes(content, request), content_type=content_type, status=status)
+
     def serve(self, request, *args, **kwargs):
+        if self.is_page_cacheable(request):
+            return self.serve_cached(request, *args, **kwargs)
+
         self.form = self.get_form(request)
         if request.method == 'POST':
-            if self.form.is_valid():
-                self.form.save(page=self)  # Save triggers an email
+            with metrics.contact_stage('submission'):
+                response = self.handle_submission(request)
+            if response:
+                return response
+
+        return super().serve(request, *args, **kwargs)
+
+    def handle_submission(self, request):
+        """
+        Sends and stores a valid submission, and returns a redirect, or returns
+        None if the form is invalid.
+        """
+        try:
+            with metrics.contact_stage('validation'):
+                is_valid = self.form.is_valid()
+            if not is_valid:
+                metrics.contact_submissions.inc(outcome='invalid')
+                return None
+
+            self.form.save(page=self)  # Save triggers an email
+            with metrics.contact_stage('store'):
                 self.store_submission(self.form.cleaned_data)
-                # Add a message to be displayed to the user
-                success_message = self.get_success_message()
-                if success_message:
-                    messages.add_message(request, messages.INFO, success_message)
+        except Exception:
+            metrics.contact_submissions.inc(outcome='error')
+            raise
+        metrics.contact_submissions.inc(outcome='sent')
 
-                request.session['enquiry_form_submitted'] = timezone.now().strftime('%Y-%m-%d %H:%M %z')
-                # Redirect to the current page, to prevent resubmissions
-                return HttpResponseRedirect(self.get_success_url())
+        # Add a message to be displayed to the user
+        success_message = self.get_success_message()
+        if success_message:
+            messages.add_message(request, messages.INFO, success_message)
 
-        return super().serve(request, *args, **kwargs)
+        # Redirect to the current page, to prevent resubmissions
+        response = HttpResponseRedirect(self.get_success_url())
+        return tracking.mark_submitted(request, response)
 
     def get_context(self, request):
         ctx = super().get_context(request)
         ctx['form'] = self.form
+        if holepunch.is_punching_holes(request):
+            ctx['csrf_token'] = holepunch.CSRF_TOKEN_MARKER
+            # Keep them out of the cache; use {% uncached %} to show them
+            ctx['messages'] = ()
         return ctx
 
     def get_success_url(self):
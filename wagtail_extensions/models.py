@@ -1,5 +1,13 @@
-from django.db import models
-from django.utils.timezone import now
+import hashlib
+import re
+import uuid
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import models, transaction
+from django.template import TemplateDoesNotExist
+from django.template.loader import render_to_string
+from django.utils.functional import cached_property
 
 from wagtail.contrib.settings.models import BaseSetting
 from wagtail.contrib.table_block.blocks import TableBlock
@@ -8,7 +16,10 @@ from wagtail.core import blocks, fields
 from wagtail.core.models import Page
 from wagtail.images.edit_handlers import ImageChooserPanel
 
+from . import app_settings
 from . import blocks as extension_blocks
+from . import clock
+from . import geo
 from . import utils
 
 
@@ -26,6 +37,73 @@ class ContactSubmission(models.Model):
         ordering = ['-date_submitted']
 
 
+class Location(models.Model):
+    """
+    A read-only, queryable copy of a location in a ContactDetailsSetting.
+    The setting's StreamField remains the source of truth.
+    """
+    setting_type = models.ForeignKey(ContentType, models.CASCADE, related_name='+')
+    site = models.ForeignKey('wagtailcore.Site', models.CASCADE, related_name='+')
+    sort_order = models.PositiveIntegerField()
+    name = models.CharField(max_length=255, db_index=True)
+    address = models.TextField(blank=True)
+    lat = models.FloatField(null=True, blank=True, db_index=True)
+    lng = models.FloatField(null=True, blank=True, db_index=True)
+    primary = models.BooleanField(default=False)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ['site', 'sort_order']
+
+
+class LocationDepartment(models.Model):
+
+    location = models.ForeignKey(Location, models.CASCADE, related_name='departments')
+    sort_order = models.PositiveIntegerField()
+    name = models.CharField(max_length=255, blank=True)
+    email = models.EmailField(blank=True, db_index=True)
+    primary = models.BooleanField(default=False)
+
+    def __str__(self):
+        return self.name or self.email
+
+    class Meta:
+        ordering = ['location', 'sort_order']
+
+
+class LocationPhone(models.Model):
+
+    department = models.ForeignKey(LocationDepartment, models.CASCADE, related_name='phones')
+    sort_order = models.PositiveIntegerField()
+    number = models.CharField(max_length=32, db_index=True)
+
+    def __str__(self):
+        return self.number
+
+    class Meta:
+        ordering = ['department', 'sort_order']
+
+
+class LocationOpeningTime(models.Model):
+
+    location = models.ForeignKey(Location, models.CASCADE, related_name='opening_times')
+    sort_order = models.PositiveIntegerField()
+    weekday = models.PositiveSmallIntegerField(null=True, blank=True, db_index=True)
+    label = models.CharField(max_length=255, blank=True)
+    date = models.DateField(null=True, blank=True, db_index=True)
+    start = models.TimeField(null=True, blank=True)
+    end = models.TimeField(null=True, blank=True)
+    closed = models.BooleanField(default=False)
+
+    def __str__(self):
+        return self.label or str(self.date or self.weekday)
+
+    class Meta:
+        ordering = ['location', 'sort_order']
+
+
 class ContentPage(Page):
 
     class Meta:
@@ -65,13 +143,31 @@ class LinksSetting(BaseSetting):
     )
 
 
+def _bulk_create_with_pks(queryset, objs):
+    """
+    Bulk creates objs, which must be queryset's rows in its order once
+    created, reading their pks back from queryset on databases that don't
+    return them from bulk inserts.
+    """
+    queryset.model.objects.bulk_create(objs)
+    if objs and objs[0].pk is None:
+        for obj, pk in zip(objs, queryset.values_list('pk', flat=True)):
+            obj.pk = pk
+    return objs
+
+
 class ContactDetailsSetting(BaseSetting):
 
     CACHE_KEY_OPENING_TODAY = "wagtail_extensions_opening_today_{:%Y%m%d}"
+    CACHE_KEY_LOCATION_INDEX = "wagtail_extensions_location_index_{}_{}_{}"
+    CACHE_KEY_VERSION = "wagtail_extensions_contact_details_version_{}"
 
-    locations = fields.StreamField([
+    # Copy locations into the Location tables on save, so they can be queried
+    sync_locations = False
+
+    locations = fields.StreamField(extension_blocks.CleanOnceStreamBlock([
         ('location', extension_blocks.LocationBlock()),
-    ])
+    ]))
 
     panels = (
         StreamFieldPanel('locations'),
@@ -82,9 +178,154 @@ class ContactDetailsSetting(BaseSetting):
 
     @classmethod
     def get_opening_today_cache_key(cls):
-        today = now().date()
+        today = clock.today()
         return cls.CACHE_KEY_OPENING_TODAY.format(today)
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self.sync_locations:
+                self.sync_location_tables()
+        # Rebuild the index now, rather than on the first nearest location lookup
+        self.location_index = self.build_location_index()
+        cache.set(self.get_location_index_cache_key(), self.location_index, None)
+        cache.set(self.get_version_cache_key(), uuid.uuid4().hex, None)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            # Not a foreign key, so not deleted with the setting
+            self.get_location_rows().delete()
+            return super().delete(*args, **kwargs)
+
+    @classmethod
+    def get_version_cache_key(cls):
+        return cls.CACHE_KEY_VERSION.format(cls._meta.label_lower)
+
+    @classmethod
+    def get_version(cls):
+        """
+        A token that changes whenever any setting of this type is saved, for
+        keying caches of data derived from them.
+        """
+        return cache.get_or_set(cls.get_version_cache_key(), lambda: uuid.uuid4().hex, None)
+
+    def get_api_representation(self):
+        """
+        Returns the contact details as JSON-serializable data.
+        """
+        locations = self.locations.stream_block.get_api_representation(self.locations)
+        return {
+            'locations': [item['value'] for item in locations],
+            'primary_opening_today': self.primary_opening_today,
+        }
+
+    def get_location_rows(self):
+        return Location.objects.filter(setting_type=ContentType.objects.get_for_model(self), site=self.site_id)
+
+    def sync_location_tables(self):
+        """
+        Replaces this setting's rows in the Location tables with its current
+        locations, with one insert per table.
+        """
+        setting_type = ContentType.objects.get_for_model(self)
+        self.get_location_rows().delete()
+
+        values = [item.value for item in self.locations]
+        locations = []
+        for i, value in enumerate(values):
+            address = value.get('address') or {}
+            point = geo.parse_point(value.get('point')) or (None, None)
+            locations.append(Location(
+                setting_type=setting_type,
+                site_id=self.site_id,
+                sort_order=i,
+                name=value.get('name') or '',
+                address='\n'.join(line for line in address.get('lines', []) if line),
+                lat=point[0],
+                lng=point[1],
+                primary=bool(value.get('primary')),
+            ))
+        _bulk_create_with_pks(self.get_location_rows().order_by('sort_order'), locations)
+
+        departments, department_phones, opening_times = [], [], []
+        for location, value in zip(locations, values):
+            for j, department_value in enumerate(value.get('departments') or []):
+                departments.append(LocationDepartment(
+                    location=location,
+                    sort_order=j,
+                    name=department_value.get('name') or '',
+                    email=department_value.get('email') or '',
+                    primary=bool(department_value.get('primary')),
+                ))
+                department_phones.append(department_value.get('phones') or [])
+
+            times = (value.get('opening_times') or {}).get('times') or []
+            for j, time in enumerate(times):
+                weekday = time.get('weekday')
+                opening_times.append(LocationOpeningTime(
+                    location=location,
+                    sort_order=j,
+                    weekday=weekday if weekday not in (None, '') else None,
+                    label=time.get('label') or '',
+                    date=time.get('date'),
+                    start=time.get('start'),
+                    end=time.get('end'),
+                    closed=bool(time.get('closed')),
+                ))
+        _bulk_create_with_pks(
+            LocationDepartment.objects.filter(location__in=locations).order_by('location__sort_order', 'sort_order'),
+            departments)
+
+        phones = [
+            LocationPhone(department=department, sort_order=k, number=getattr(phone, 'as_e164', phone))
+            for department, numbers in zip(departments, department_phones)
+            for k, phone in enumerate(numbers) if phone
+        ]
+        LocationPhone.objects.bulk_create(phones)
+        LocationOpeningTime.objects.bulk_create(opening_times)
+
+    def get_location_index_cache_key(self):
+        # Keyed on the points, so an index built from other locations, e.g.
+        # before they were changed without save(), is never used
+        points = '|'.join(str(item['value'].get('point')) for item in self.locations.raw_data)
+        points = hashlib.sha1(points.encode()).hexdigest()
+        return self.CACHE_KEY_LOCATION_INDEX.format(self._meta.label_lower, self.pk, points)
+
+    def build_location_index(self):
+        """
+        Indexes each location's point by its position in the stream. Reads the
+        stored JSON, so no location is deserialized.
+        """
+        points = []
+        for i, item in enumerate(self.locations.raw_data):
+            point = geo.parse_point(item['value'].get('point'))
+            if point:
+                points.append((i,) + point)
+        return geo.LocationIndex(points)
+
+    @cached_property
+    def location_index(self):
+        if self.pk is None:
+            return self.build_location_index()
+        key = self.get_location_index_cache_key()
+        index = cache.get(key)
+        if index is None:
+            index = self.build_location_index()
+            cache.set(key, index, None)
+        return index
+
+    def nearest_locations(self, lat, lng, k=1):
+        """
+        Returns (distance_km, location) pairs for the k locations nearest to a point.
+        """
+        return [(distance, self.locations[i]) for distance, i in self.location_index.nearest(lat, lng, k)]
+
+    def locations_within(self, lat, lng, radius_km):
+        """
+        Returns (distance_km, location) pairs for locations within radius_km of a point, nearest first.
+        """
+        return [(distance, self.locations[i]) for distance, i in self.location_index.within(lat, lng, radius_km)]
+
     @property
     def primary_location(self):
         return utils.true_or_nth(self.locations, lambda x: x.value.get('primary') == True)
@@ -121,6 +362,15 @@ class ContactDetailsSetting(BaseSetting):
 
 
 class SocialMediaSetting(BaseSetting):
+    """
+    Keeps its profiles rendered as HTML in the cache, regenerated on save, for
+    the social_profiles tag.
+    """
+    CACHE_KEY_PROFILES_HTML = "wagtail_extensions_social_profiles_html_{}_{}_{}"
+    ICON_NAME_RE = re.compile(r'^[\w-]+$')
+
+    profiles_template = 'wagtail_extensions/partials/social_profiles.html'
+    profiles_html_cache_timeout = 60 * 60 * 24
 
     class Meta:
         abstract = True
@@ -132,3 +382,73 @@ class SocialMediaSetting(BaseSetting):
     panels = (
         StreamFieldPanel('profiles'),
     )
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        cache.set(self.get_profiles_html_cache_key(self.site_id), self.render_profiles(),
+                  self.profiles_html_cache_timeout)
+
+    def delete(self, *args, **kwargs):
+        cache.delete(self.get_profiles_html_cache_key(self.site_id))
+        return super().delete(*args, **kwargs)
+
+    @classmethod
+    def get_profiles_html_cache_key(cls, site_id):
+        return cls.CACHE_KEY_PROFILES_HTML.format(cls._meta.label_lower, site_id, app_settings.SOCIAL_MEDIA_ICONS)
+
+    @classmethod
+    def get_profiles_html_for_site(cls, site):
+        """
+        Returns the profiles HTML of site's setting, without loading the
+        setting if it is cached.
+        """
+        html = cache.get(cls.get_profiles_html_cache_key(site.pk))
+        if html is None:
+            html = cls.for_site(site).profiles_html
+        return html
+
+    @property
+    def profiles_html(self):
+        key = self.get_profiles_html_cache_key(self.site_id)
+        html = cache.get(key)
+        if html is None:
+            html = self.render_profiles()
+            cache.set(key, html, self.profiles_html_cache_timeout)
+        return html
+
+    @classmethod
+    def get_icon_symbol(cls, icon):
+        """
+        Returns the SVG symbol for an icon, from the
+        wagtail_extensions/icons/<icon>.svg template, or None.
+        """
+        if not cls.ICON_NAME_RE.match(icon or ''):
+            return None
+        try:
+            return render_to_string('wagtail_extensions/icons/{}.svg'.format(icon)).strip()
+        except TemplateDoesNotExist:
+            return None
+
+    def render_profiles(self):
+        """
+        Renders the profiles from the stored JSON, so no block is deserialized,
+        with Font Awesome or inline SVG icons (WAGTAIL_EXTENSIONS_SOCIAL_MEDIA_ICONS).
+        """
+        svg = app_settings.SOCIAL_MEDIA_ICONS == 'svg'
+        labels = dict(app_settings.SOCIAL_MEDIA_TYPES)
+        profiles, symbols = [], {}
+        for item in self.profiles.raw_data:
+            icon, url = item['value'].get('icon'), item['value'].get('url')
+            if svg and icon not in symbols:
+                symbols[icon] = self.get_icon_symbol(icon)
+            profiles.append({
+                'icon': icon,
+                'url': url,
+                'label': labels.get(icon, icon),
+                'has_symbol': bool(svg and symbols[icon]),
+            })
+        return render_to_string(self.profiles_template, {
+            'profiles': profiles,
+            'svg': svg,
+            'symbols': [symbol for symbol in symbols.values() if symbol],
+        })
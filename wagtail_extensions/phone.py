@@ -0,0 +1,51 @@
+from functools import lru_cache
+
+from django.utils.functional import cached_property
+from phonenumber_field import phonenumber
+from phonenumbers import NumberParseException, PhoneNumberFormat
+
+from . import app_settings
+
+
+class CachedPhoneNumber(phonenumber.PhoneNumber):
+    """
+    A PhoneNumber that only validates and formats itself once.
+
+    Instances are shared between block values by parse_phone_number, so must
+    not be modified.
+    """
+
+    def is_valid(self):
+        try:
+            return self._is_valid
+        except AttributeError:
+            self._is_valid = super().is_valid()
+            return self._is_valid
+
+    @cached_property
+    def as_e164(self):
+        return self.format_as(PhoneNumberFormat.E164)
+
+    @cached_property
+    def as_national(self):
+        return self.format_as(PhoneNumberFormat.NATIONAL)
+
+    @cached_property
+    def as_international(self):
+        return self.format_as(PhoneNumberFormat.INTERNATIONAL)
+
+
+@lru_cache(maxsize=app_settings.PHONE_NUMBER_CACHE_SIZE)
+def parse_phone_number(value, region):
+    try:
+        number = CachedPhoneNumber.from_string(value, region=region)
+    except NumberParseException:
+        return CachedPhoneNumber(raw_input=value)
+
+    if number.is_valid():
+        # Format up front, so templates never run the formatter
+        number.as_e164, number.as_national
+    return number
+
+
+to_python = phonenumber.to_python
@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+from django.db import connection
+from wagtail.core.fields import StreamField
+
+from . import app_settings
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=app_settings.RENDITION_PREWARM_WORKERS,
+            thread_name_prefix='wagtail_extensions_renditions',
+        )
+    return _executor
+
+
+def get_page_rendition_specs(page):
+    """
+    Yields (image, filter_spec) pairs for every block in the page's
+    StreamFields that knows which renditions its template will use.
+    """
+    page = page.specific
+    for field in page._meta.get_fields():
+        if not isinstance(field, StreamField):
+            continue
+        for child in getattr(page, field.name) or []:
+            get_specs = getattr(child.block, 'get_rendition_specs', None)
+            if get_specs:
+                yield from get_specs(child.value)
+
+
+def generate_rendition(image, filter_spec):
+    try:
+        image.get_rendition(filter_spec)
+    except Exception:
+        logger.exception("Could not generate %s rendition for image %s", filter_spec, image.pk)
+
+
+def _generate_rendition_in_worker(image, filter_spec):
+    try:
+        generate_rendition(image, filter_spec)
+    finally:
+        # Worker threads get their own connection, which nothing else will close
+        connection.close()
+
+
+def prewarm_page_renditions(page, executor=None):
+    """
+    Generates the page's block renditions in the background, so the first
+    visitor does not wait for the images to be resized.
+    """
+    executor = executor or get_executor()
+    specs = set(
+        (image, filter_spec)
+        for image, filter_spec in get_page_rendition_specs(page)
+    )
+    return [executor.submit(_generate_rendition_in_worker, image, filter_spec) for image, filter_spec in specs]
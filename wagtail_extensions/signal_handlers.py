@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from wagtail.core.models import Page, PageViewRestriction
+from wagtail.core.signals import page_published, page_unpublished, post_page_move
+
+from . import app_settings
+from . import menus
+from . import renditions
+
+
+def prewarm_published_page_renditions(sender, instance, **kwargs):
+    if app_settings.RENDITION_PREWARM_WORKERS:
+        # Wait for the publish to commit, so the worker threads see the new revision
+        transaction.on_commit(lambda: renditions.prewarm_page_renditions(instance))
+
+
+def page_tree_changed(sender, instance, **kwargs):
+    if isinstance(instance, Page):
+        # Wait for the change to commit, so nothing caches the old tree under the new version
+        transaction.on_commit(menus.bump_tree_version)
+
+
+def page_view_restriction_changed(sender, instance, **kwargs):
+    # The menu children JSON only lists public pages
+    transaction.on_commit(menus.bump_tree_version)
+
+
+def register_signal_handlers():
+    page_published.connect(prewarm_published_page_renditions)
+    page_published.connect(page_tree_changed)
+    page_unpublished.connect(page_tree_changed)
+    post_page_move.connect(page_tree_changed)
+    post_delete.connect(page_tree_changed)
+    post_save.connect(page_view_restriction_changed, sender=PageViewRestriction)
+    post_delete.connect(page_view_restriction_changed, sender=PageViewRestriction)
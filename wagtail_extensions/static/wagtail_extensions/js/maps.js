@@ -1,7 +1,23 @@
 "use strict";
 
-function init_maps() {
-    document.querySelectorAll('.wagtail-geo-widget-map').forEach(function(el) {
+var wagtail_extensions_maps = (function() {
+    var script = document.currentScript,
+        api_key = script ? script.getAttribute('data-api-key') : null,
+        api_requested = false,
+        queued = [];
+
+    function init_map(el) {
+        if (el.hasAttribute('data-map-initialised')) {
+            return;
+        }
+        el.setAttribute('data-map-initialised', '');
+
+        if (el.hasAttribute('data-static')) {
+            // Keep the static image's footprint for the interactive map
+            el.style.height = el.offsetHeight + 'px';
+            el.textContent = '';
+        }
+
         var point = {lat: parseFloat(el.getAttribute('data-lat')), lng: parseFloat(el.getAttribute('data-lng'))},
             map = new google.maps.Map(el, {
                 zoom: parseInt(el.getAttribute('data-zoom')),
@@ -11,5 +27,87 @@ function init_maps() {
                 position: point,
                 map: map
             });
-    });
+    }
+
+    function load_api() {
+        if (api_requested) {
+            return;
+        }
+        api_requested = true;
+
+        var api = document.createElement('script');
+        api.src = 'https://maps.googleapis.com/maps/api/js?key=' + encodeURIComponent(api_key || '') + '&callback=init_maps';
+        api.async = true;
+        document.head.appendChild(api);
+    }
+
+    function request_map(el) {
+        if (window.google && window.google.maps) {
+            init_map(el);
+        } else {
+            queued.push(el);
+            load_api();
+        }
+    }
+
+    function init_queued() {
+        queued.splice(0).forEach(init_map);
+    }
+
+    function observe(maps) {
+        if (!('IntersectionObserver' in window)) {
+            maps.forEach(request_map);
+            return;
+        }
+
+        // Only fetch the Maps API once a map is about to scroll into view
+        var observer = new IntersectionObserver(function(entries) {
+            entries.forEach(function(entry) {
+                if (entry.isIntersecting) {
+                    observer.unobserve(entry.target);
+                    request_map(entry.target);
+                }
+            });
+        }, {rootMargin: '200px'});
+
+        maps.forEach(function(el) {
+            observer.observe(el);
+        });
+    }
+
+    function activate_on_click(el) {
+        el.addEventListener('click', function() {
+            request_map(el);
+        }, {once: true});
+    }
+
+    function setup() {
+        var maps = Array.prototype.slice.call(document.querySelectorAll('.wagtail-geo-widget-map'));
+
+        // Static maps are already an image; only load the real thing when asked to
+        maps.filter(function(el) {
+            return el.hasAttribute('data-static');
+        }).forEach(activate_on_click);
+
+        observe(maps.filter(function(el) {
+            return !el.hasAttribute('data-static');
+        }));
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', setup);
+    } else {
+        setup();
+    }
+
+    return {
+        init_map: init_map,
+        init_queued: init_queued,
+        request_map: request_map
+    };
+})();
+
+function init_maps() {
+    // Called by the Maps API once it has loaded
+    wagtail_extensions_maps.init_queued();
 }
@@ -0,0 +1,88 @@
+"use strict";
+
+var wagtail_extensions_menu = (function() {
+    // Loads deeper menu levels from the menu children JSON when their toggle
+    // is first opened. The URLs carry the page tree version, so the browser
+    // cache can serve repeat visits.
+
+    function is_active(url) {
+        try {
+            return window.location.pathname.indexOf(new URL(url, window.location.href).pathname) === 0;
+        } catch (e) {
+            return false;
+        }
+    }
+
+    function render_items(items) {
+        var menu = document.createElement('div');
+        menu.className = 'dropdown-menu dropdown-submenu show';
+
+        items.forEach(function(item) {
+            var link = document.createElement('a');
+            link.className = 'dropdown-item' + (item.url && is_active(item.url) ? ' active' : '');
+            link.href = item.url || '#';
+            link.textContent = item.title;
+            menu.appendChild(link);
+
+            if (item.children_url) {
+                var toggle = document.createElement('button');
+                toggle.type = 'button';
+                toggle.className = 'dropdown-submenu-toggle';
+                toggle.setAttribute('data-menu-children-url', item.children_url);
+                toggle.setAttribute('aria-expanded', 'false');
+                toggle.setAttribute('aria-label', 'Show pages under ' + item.title);
+                menu.appendChild(toggle);
+            }
+        });
+        return menu;
+    }
+
+    function load(toggle) {
+        toggle.setAttribute('data-menu-loading', '');
+        return fetch(toggle.getAttribute('data-menu-children-url'), {credentials: 'same-origin'})
+            .then(function(response) {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.json();
+            })
+            .then(function(data) {
+                var menu = render_items(data.items);
+                toggle.parentNode.insertBefore(menu, toggle.nextSibling);
+                return menu;
+            })
+            .finally(function() {
+                toggle.removeAttribute('data-menu-loading');
+            });
+    }
+
+    function toggle_submenu(toggle) {
+        var menu = toggle.nextElementSibling,
+            expanded = toggle.getAttribute('aria-expanded') === 'true';
+
+        if (menu && menu.classList.contains('dropdown-submenu')) {
+            menu.classList.toggle('show', !expanded);
+            toggle.setAttribute('aria-expanded', String(!expanded));
+        } else if (!toggle.hasAttribute('data-menu-loading')) {
+            load(toggle).then(function() {
+                toggle.setAttribute('aria-expanded', 'true');
+            }, function() {
+                // Leave the toggle to try again
+            });
+        }
+    }
+
+    document.addEventListener('click', function(event) {
+        var toggle = event.target.closest ? event.target.closest('[data-menu-children-url]') : null;
+        if (toggle) {
+            // Keep the parent dropdown open
+            event.preventDefault();
+            event.stopPropagation();
+            toggle_submenu(toggle);
+        }
+    }, true);
+
+    return {
+        load: load
+    };
+})();
@@ -1,32 +1,48 @@
-from datetime import datetime
+from datetime import timedelta
 from urllib.parse import urlsplit
 
+from django.apps import apps
 from django.template import Library, Node
 from django.template.defaultfilters import escape, stringfilter
-from django.utils import html, timezone
+from django.utils import html
+from django.utils.safestring import mark_safe
 
-import bleach
-from wagtailgeowidget.app_settings import (
-    GEO_WIDGET_ZOOM,
-    GOOGLE_MAPS_V3_APIKEY,
-)
+from wagtail.core.models import Page, Site
+from wagtail.images.shortcuts import get_rendition_or_not_found
+
+from .. import app_settings
+from .. import clock
+from .. import holepunch
+from .. import instrumentation
+from .. import menus
+from .. import tracking
+from ..blocks import OpeningTimesBlock
+from ..maps import get_static_map_url
 
 
 register = Library()
 
 
 @register.inclusion_tag('wagtail_extensions/partials/map.html')
-def map(location, zoom=GEO_WIDGET_ZOOM):
+def map(location, zoom=None, static=False):
+    """
+    Renders a map of the location. Static maps show a pre-rendered image
+    and only load the interactive map once clicked.
+    """
+    if zoom is None:
+        zoom = app_settings.GEO_WIDGET_ZOOM
     return {
         'location': location,
         'zoom': zoom,
+        'static_map_url': get_static_map_url(location, zoom) if static and location else None,
+        'static_map_size': app_settings.STATIC_MAP_SIZE,
     }
 
 
 @register.inclusion_tag('wagtail_extensions/partials/map_assets.html')
 def map_assets():
     return {
-        'api_key': GOOGLE_MAPS_V3_APIKEY,
+        'api_key': app_settings.GOOGLE_MAPS_V3_APIKEY,
     }
 
 
@@ -48,6 +64,19 @@ def humanize_date_range(start, end):
     return "{} - {}".format(start.strftime(start_fmt), end.strftime(day_fmt))
 
 
+@register.inclusion_tag('wagtail_extensions/partials/opening_schedule.html')
+def opening_schedule(opening_times, days=30):
+    """
+    Renders the opening times for each of the next number of days, with runs
+    of days that have the same hours collapsed into one line.
+    """
+    start = clock.today()
+    end = start + timedelta(days=days - 1)
+    return {
+        'schedule': list(OpeningTimesBlock.group_schedule(opening_times, start, end)),
+    }
+
+
 @register.simple_tag
 def block_method(block_value, method_name):
     method = getattr(block_value.block, method_name)
@@ -57,25 +86,31 @@ def block_method(block_value, method_name):
         return None
 
 
-@register.inclusion_tag('wagtail_extensions/partials/track_form_submission.html')
-def track_form_submission(request):
-    submitted = request.session.get('enquiry_form_submitted', False)
-    if submitted:
-        # Remove the session variable
-        del request.session['enquiry_form_submitted']
-        try:
-            submitted_time = datetime.strptime(submitted, '%Y-%m-%d %H:%M %z')
-        except ValueError:
-            return {'enquiry_form_submitted': False}
+@register.simple_tag
+def image_srcset(image, filter_specs):
+    """
+    Builds a srcset attribute value from a rendition for each filter spec.
+    """
+    if not image:
+        return ''
+    renditions = (get_rendition_or_not_found(image, spec) for spec in filter_specs)
+    return ', '.join('{} {}w'.format(r.url, r.width) for r in renditions)
 
-        if (timezone.now() - submitted_time).seconds < 60:
-            return {'enquiry_form_submitted': True}
 
-    return {'enquiry_form_submitted': False}
+@register.inclusion_tag('wagtail_extensions/partials/track_form_submission.html')
+def track_form_submission(request):
+    mode = tracking.get_mode()
+    if mode != tracking.SESSION:
+        # Reported in the browser, so the page doesn't depend on the request
+        return {'mode': mode, 'key': tracking.KEY}
+    if holepunch.is_punching_holes(request):
+        # The submission is the visitor's, so it's reported when the cached page is served
+        return {'hole': holepunch.get_template_marker('wagtail_extensions/partials/track_session_submission.html')}
+    return {'enquiry_form_submitted': tracking.pop_session_submission(request)}
 
 
 def page_menu_children(page, calling_page=None):
-    children = page.get_children().live().in_menu()
+    children = menus.get_menu_children(page)
     for child in children:
         child.active = (calling_page.url.startswith(child.url) if calling_page else False)
     return children
@@ -85,8 +120,18 @@ def page_menu_children(page, calling_page=None):
 def menu(context, parent, calling_page=None):
     menuitems = page_menu_children(parent, calling_page)
 
+    # Deeper levels are loaded by menu.js when opened
+    tree_version = menus.get_tree_version()
     for menuitem in menuitems:
         menuitem.children = page_menu_children(menuitem, calling_page)
+        for child in menuitem.children:
+            child.children_url = menus.get_children_url(child, tree_version)
+
+    loaded_pages = get_loaded_pages(context['request'])
+    loaded_pages[parent.path] = parent
+    for menuitem in menuitems:
+        loaded_pages[menuitem.path] = menuitem
+        loaded_pages.update((child.path, child) for child in menuitem.children)
 
     return {
         'calling_page': calling_page,
@@ -96,6 +141,104 @@ def menu(context, parent, calling_page=None):
     }
 
 
+def get_loaded_pages(request):
+    """
+    Returns the pages loaded by the menu tag while rendering this request, by
+    their tree path, for other tags to reuse.
+    """
+    if request is None:
+        return {}
+    try:
+        return request._wagtail_extensions_loaded_pages
+    except AttributeError:
+        request._wagtail_extensions_loaded_pages = {}
+        return request._wagtail_extensions_loaded_pages
+
+
+def get_site_root_paths(request):
+    """
+    Returns Site.get_site_root_paths(), sharing the copy Page.get_url caches
+    on the request.
+    """
+    if request is None:
+        return Site.get_site_root_paths()
+    try:
+        return request._wagtail_cached_site_root_paths
+    except AttributeError:
+        request._wagtail_cached_site_root_paths = Site.get_site_root_paths()
+        return request._wagtail_cached_site_root_paths
+
+
+def get_breadcrumb_pages(page, request=None):
+    """
+    Returns the ancestors of page from its site's root page, oldest first.
+
+    The ancestors' tree paths are prefixes of the page's, so they are fetched
+    in one query, or none if the menu tag has already loaded them.
+    """
+    site_root_paths = [srp.root_path for srp in get_site_root_paths(request) if page.url_path.startswith(srp.root_path)]
+    if not site_root_paths:
+        return []
+    # A url_path like /home/about/ has a slash per level of the tree
+    root_depth = max(site_root_paths, key=len).count('/')
+    paths = [page.path[:end] for end in range(root_depth * page.steplen, len(page.path), page.steplen)]
+
+    loaded_pages = get_loaded_pages(request)
+    pages = {path: loaded_pages[path] for path in paths if path in loaded_pages}
+    missing = [path for path in paths if path not in pages]
+    if missing:
+        pages.update((ancestor.path, ancestor) for ancestor in Page.objects.filter(path__in=missing))
+    return [pages[path] for path in paths if path in pages]
+
+
+@register.inclusion_tag('wagtail_extensions/partials/breadcrumbs.html', takes_context=True)
+def breadcrumbs(context, page=None):
+    """
+    Renders links to the ancestors of the page, the current page by default.
+    """
+    page = page or context.get('page')
+    request = context.get('request')
+    if page is None:
+        return {'crumbs': []}
+    ancestors = get_breadcrumb_pages(page, request)
+    return {
+        'page': page,
+        'crumbs': [(ancestor, ancestor.get_url(request)) for ancestor in ancestors],
+    }
+
+
+@register.simple_tag(takes_context=True)
+def social_profiles(context, setting):
+    """
+    Renders a SocialMediaSetting's profiles from its pre-rendered HTML.
+    setting is the setting, or its model's label, e.g. "myapp.SocialMedia",
+    which skips loading the setting while its HTML is cached.
+    """
+    if isinstance(setting, str):
+        site = Site.find_for_request(context['request'])
+        if site is None:
+            return ''
+        return mark_safe(apps.get_model(setting).get_profiles_html_for_site(site))
+    return mark_safe(setting.profiles_html)
+
+
+@register.simple_tag(takes_context=True)
+def uncached(context, template_name):
+    """
+    Includes a template that is rendered for each request, even when the
+    page is served from the cache, e.g. to show messages.
+    """
+    request = context.get('request')
+    if request is not None and holepunch.is_punching_holes(request):
+        return holepunch.get_template_marker(template_name)
+    return context.template.engine.get_template(template_name).render(context)
+
+
+@register.inclusion_tag('wagtail_extensions/partials/menu_assets.html')
+def menu_assets():
+    return {}
+
+
 @register.tag
 def metablock(parser, token):
     """
@@ -123,3 +266,8 @@ def unescape(text):
     return text.replace(
         "&amp;", "&").replace("&lt;", "<").replace("&gt;", ">").replace(
         "&quot;", '"').replace("&#39;", "'")
+
+
+instrumentation.instrument_tags(
+    register, 'map', 'map_assets', 'opening_schedule', 'image_srcset', 'track_form_submission', 'menu', 'breadcrumbs',
+    'metablock', 'social_profiles')
@@ -0,0 +1,80 @@
+"""
+Marks contact form submissions for the track_form_submission tag, which
+reports them to Google Analytics on the page the form redirects to.
+
+WAGTAIL_EXTENSIONS_FORM_SUBMISSION_TRACKING chooses how:
+
+- ``session``: a timestamp in the session, read and removed by the tag.
+- ``cookie``: a short-lived signed cookie, read and removed in the browser.
+- ``query``: a query parameter on the redirect, read and removed in the
+  browser.
+
+With ``cookie`` or ``query`` the tag renders the same script on every page,
+so pages don't touch the session and stay cacheable.
+"""
+from datetime import datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+
+from . import app_settings
+
+
+SESSION = 'session'
+COOKIE = 'cookie'
+QUERY = 'query'
+MODES = (SESSION, COOKIE, QUERY)
+
+# Session key, cookie name and query parameter
+KEY = 'enquiry_form_submitted'
+# Seconds after submitting that the submission is still reported
+MAX_AGE = 60
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M %z'
+
+
+def get_mode():
+    mode = app_settings.FORM_SUBMISSION_TRACKING
+    if mode not in MODES:
+        raise ImproperlyConfigured(
+            "WAGTAIL_EXTENSIONS_FORM_SUBMISSION_TRACKING must be one of {}".format(', '.join(MODES)))
+    return mode
+
+
+def add_query_param(url, name, value):
+    scheme, netloc, path, query, fragment = urlsplit(url)
+    params = [(k, v) for k, v in parse_qsl(query, keep_blank_values=True) if k != name]
+    params.append((name, value))
+    return urlunsplit((scheme, netloc, path, urlencode(params), fragment))
+
+
+def mark_submitted(request, response):
+    """
+    Marks a submission on the redirect response that follows it.
+    """
+    mode = get_mode()
+    if mode == SESSION:
+        request.session[KEY] = timezone.now().strftime(TIMESTAMP_FORMAT)
+    elif mode == COOKIE:
+        # Not httponly, as the browser removes it once reported
+        response.set_signed_cookie(
+            KEY, '1', salt=KEY, max_age=MAX_AGE, secure=request.is_secure(), samesite='Lax')
+    else:
+        response['Location'] = add_query_param(response['Location'], KEY, '1')
+    return response
+
+
+def pop_session_submission(request):
+    """
+    Returns whether the session has a submission from the last MAX_AGE
+    seconds, and removes it.
+    """
+    submitted = request.session.pop(KEY, None)
+    if not submitted:
+        return False
+    try:
+        submitted_time = datetime.strptime(submitted, TIMESTAMP_FORMAT)
+    except ValueError:
+        return False
+    return (timezone.now() - submitted_time).seconds < MAX_AGE
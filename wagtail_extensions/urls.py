@@ -0,0 +1,11 @@
+from django.urls import path
+
+from . import views
+
+
+app_name = 'wagtail_extensions'
+
+urlpatterns = [
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
+    path('menu/<int:page_id>/', views.MenuChildrenView.as_view(), name='menu_children'),
+]
@@ -22,5 +22,16 @@ def true_or_nth(iterable, predicate=None, n=0, default=None):
     If no value is found, returns the nth (n) value.
 
     If the iterable is empty, return default.
+
+    The iterable is walked once, so generators work and the predicate sees
+    every item.
     """
-    return first_true(iterable, predicate=predicate, default=nth(iterable, n, default=default))
+    if predicate is None:
+        predicate = bool
+    fallback = default
+    for i, item in enumerate(iterable):
+        if predicate(item):
+            return item
+        if i == n:
+            fallback = item
+    return fallback
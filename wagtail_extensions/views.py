@@ -0,0 +1,118 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotModified
+from django.shortcuts import get_object_or_404
+from django.utils.cache import add_never_cache_headers, patch_cache_control
+from django.utils.http import parse_etags
+from django.views import View
+from wagtail.core.models import Page
+
+from . import app_settings
+from . import clock
+from . import menus
+from . import metrics
+
+
+class CachedJSONView(View):
+    """
+    Serves JSON that is serialized once per cache key, and cached along with
+    its ETag, so conditional requests are answered without touching the
+    database.
+    """
+    max_age = 5 * 60
+    s_maxage = 60 * 60
+    cache_timeout = 60 * 60 * 24
+
+    def get_cache_key(self, request):
+        raise NotImplementedError
+
+    def get_data(self, request):
+        raise NotImplementedError
+
+    def serialize(self, request):
+        body = json.dumps(self.get_data(request), cls=DjangoJSONEncoder, separators=(',', ':'))
+        etag = '"{}"'.format(hashlib.sha1(body.encode()).hexdigest())
+        return etag, body
+
+    def get(self, request, *args, **kwargs):
+        cache_key = self.get_cache_key(request)
+        cached = cache.get(cache_key)
+        if cached is None:
+            cached = self.serialize(request)
+            cache.set(cache_key, cached, self.cache_timeout)
+        etag, body = cached
+
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=self.max_age, s_maxage=self.s_maxage)
+        return response
+
+
+class ContactDetailsView(CachedJSONView):
+    """
+    Serves a ContactDetailsSetting as JSON, serialized once per setting
+    version, host and day.
+    """
+    setting_model = None
+
+    CACHE_KEY = "wagtail_extensions_contact_details_json_{}_{}_{}_{:%Y%m%d}"
+
+    def get_setting_model(self):
+        if self.setting_model is None:
+            raise ImproperlyConfigured("ContactDetailsView requires a setting_model")
+        return self.setting_model
+
+    def get_cache_key(self, request):
+        model = self.get_setting_model()
+        return self.CACHE_KEY.format(model._meta.label_lower, request.get_host(), model.get_version(), clock.today())
+
+    def get_data(self, request):
+        return self.get_setting_model().for_request(request).get_api_representation()
+
+
+class MenuChildrenView(CachedJSONView):
+    """
+    Serves the menu children of a live, public page in the menu as JSON,
+    serialized once per page tree version and host, for menu.js to load
+    deeper menu levels.
+    """
+    CACHE_KEY = "wagtail_extensions_menu_children_json_{}_{}_{}"
+
+    def get_cache_key(self, request):
+        return self.CACHE_KEY.format(self.kwargs['page_id'], request.get_host(), menus.get_tree_version())
+
+    def get_data(self, request):
+        page = get_object_or_404(Page.objects.live().public().in_menu(), pk=self.kwargs['page_id'])
+        return {'items': menus.get_menu_items(page, request)}
+
+
+class MetricsView(View):
+    """
+    Serves the metrics registry in the Prometheus text format.
+
+    Only requests from WAGTAIL_EXTENSIONS_METRICS_ALLOWED_IPS, which is empty
+    by default, are allowed. Proxied requests, with an X-Forwarded-For header,
+    are refused, as a reverse proxy on an allowed address would otherwise
+    expose them. Proxies that don't set the header can't be told apart.
+    """
+    registry = metrics.registry
+
+    def is_allowed(self, request):
+        if 'HTTP_X_FORWARDED_FOR' in request.META:
+            return False
+        return request.META.get('REMOTE_ADDR') in app_settings.METRICS_ALLOWED_IPS
+
+    def get(self, request, *args, **kwargs):
+        if not self.is_allowed(request):
+            return HttpResponseForbidden()
+        response = HttpResponse(self.registry.expose(), content_type='text/plain; version=0.0.4; charset=utf-8')
+        add_never_cache_headers(response)
+        return response